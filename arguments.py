@@ -26,10 +26,17 @@ class Arguments:
         self.subparsers = self.parser.add_subparsers(dest="command")  # ← No required=True
 
         self.subparsers.add_parser("start", help="Start the web application")
-        self.subparsers.add_parser("train", help="Start training the model")
+        train_parser = self.subparsers.add_parser("train", help="Start training the model")
+        train_parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue from the latest training checkpoint"
+        )
         self.subparsers.add_parser("test", help="Start testing the model")
         self.subparsers.add_parser("predict", help="Start Predict the Video")
         self.subparsers.add_parser("extract", help="Start Extract Frames from Video Files to Images")
+        self.subparsers.add_parser("export", help="Export the trained model to ONNX")
+        self.subparsers.add_parser("distill", help="Distill the trained model into a compact student")
 
         self.subparsers.add_parser("create-userdir", help="Create user-data directory")
 
@@ -36,12 +36,12 @@ class DeepFake:
         
         self._api_server.add_rpc_handler(self._rpc)
         
-    def start_train(self) -> None:
+    def start_train(self, resume: bool = False) -> None:
         """"
         strat the training model...
         """
         from deepfake.deepfakeai import train_model
-        train_model(self.config)
+        train_model(self.config, resume=resume)
         
     def start_test(self) -> None:
         """"
@@ -57,6 +57,22 @@ class DeepFake:
         from deepfake.deepfakeai import extract_frames
 
         extract_frames(self.config)
+
+    def start_export(self) -> None:
+        """"
+        Export the trained model to ONNX
+        """
+        from deepfake.deepfakeai import export_model
+
+        export_model(self.config)
+
+    def start_distill(self) -> None:
+        """"
+        Distill the trained model into a compact student model
+        """
+        from deepfake.deepfakeai import distill_model
+
+        distill_model(self.config)
     
     def start_predict(self) -> None:
         pass
@@ -1,4 +1,6 @@
 from deepfake.deepfakeai.extract_frames import extract_frames
 from deepfake.deepfakeai.train import train_model
 from deepfake.deepfakeai.test import test_model
+from deepfake.deepfakeai.export import export_model
+from deepfake.deepfakeai.distill import distill_model
 from deepfake.deepfakeai.predict import Predictor
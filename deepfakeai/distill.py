@@ -0,0 +1,129 @@
+import logging
+import os
+from tqdm import tqdm
+
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+
+from deepfake.exceptions import OperationalException
+from deepfake.deepfakeai.utils import build_dataset, create_data_loader, dataset_cache_dir
+from deepfake.deepfakeai.utils.files import atomic_save
+from deepfake.deepfakeai.utils.preprocess import (
+    BatchCollate,
+    SequenceCollate,
+    ToUint8Tensor,
+    split_batch
+)
+from deepfake.deepfakeai.models.backbone import pretrained_weights_dir
+from deepfake.deepfakeai.models.checkpoint import load_configured_model
+from deepfake.deepfakeai.models.precision import PrecisionPolicy
+from deepfake.deepfakeai.models.student_model import StudentModel
+
+logger = logging.getLogger(__name__)
+
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def student_model_name(config):
+    """
+    Model name of the distilled student: distill.student_name, else <model_name>_student
+    """
+    return config.get("distill", {}).get("student_name") or f"{config['model_name']}_student"
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """
+    alpha * T^2 * KL(teacher || student) on temperature-softened outputs
+    + (1 - alpha) * cross entropy with the hard labels
+    """
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean"
+    ) * temperature ** 2
+    return alpha * soft + (1 - alpha) * F.cross_entropy(student_logits, labels)
+
+
+def distill_model(config: dict[str, dict]):
+    """
+    Train the compact StudentModel on the soft outputs of the ``model_name``
+    teacher over imgdir/train and save it as ``<student name>.pth``
+    (set ``model_name`` to the student name to serve it with the Predictor)
+    """
+    image_dataset = config["imgdir"] / "train"
+    models_dir = config["modelsdir"]
+    teacher_path = os.path.join(str(models_dir), f"{config['model_name']}.pth")
+    student_name = student_model_name(config)
+    student_path = os.path.join(str(models_dir), f"{student_name}.pth")
+
+    if not os.path.exists(teacher_path):
+        raise OperationalException(f"Teacher model {config['model_name']}.pth not found in {models_dir}, train it first.")
+
+    distill_config = config.get("distill", {})
+    dataloader_config = config.get("dataloader", {})
+    seq_len = dataloader_config.get("sequence_length", 1)
+
+    teacher = load_configured_model(config, teacher_path, device)
+    teacher.requires_grad_(False)
+
+    # The student is trained on the inputs of the teacher, at its resolution
+    train_dataset = build_dataset(
+        root_dir=str(image_dataset),
+        transform=ToUint8Tensor(teacher.image_size),
+        data_format=dataloader_config.get("format", "files"),
+        shuffle=True,
+        cache_dir=dataset_cache_dir(config),
+        seq_len=seq_len,
+        seq_stride=dataloader_config.get("sequence_stride"),
+        decode_backend=dataloader_config.get("decode_backend", "pil"),
+        image_size=teacher.image_size
+    )
+    train_loader = create_data_loader(
+        train_dataset,
+        config,
+        collate_fn=SequenceCollate(train=True) if seq_len > 1 else BatchCollate(train=True),
+        shuffle=True
+    )
+
+    student = StudentModel(
+        cnn_backbone=distill_config.get("student_backbone", "mobilenetv3_small_100"),
+        num_classes=2,
+        weights_dir=pretrained_weights_dir(config),
+        image_size=teacher.image_size
+    ).to(device)
+
+    policy = PrecisionPolicy.from_config(config, device)
+    teacher = policy.prepare_model(teacher)
+    student = policy.prepare_model(student)
+
+    temperature = distill_config.get("temperature", 4.0)
+    alpha = distill_config.get("alpha", 0.7)
+    optimizer = optim.Adam(student.parameters(), lr=distill_config.get("lr", 1e-4))
+    scaler = policy.grad_scaler()
+
+    for epoch in range(distill_config.get("epochs", 5)):
+        if hasattr(train_dataset, "set_epoch"):
+            train_dataset.set_epoch(epoch)
+        student.train()
+        total_loss = 0
+        for batch in tqdm(train_loader):
+            imgs, labels, lengths = split_batch(batch)
+            imgs, labels = imgs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+
+            with policy.autocast():
+                with torch.no_grad():
+                    teacher_logits = teacher(imgs, lengths)
+                student_logits = student(imgs, lengths)
+                loss = distillation_loss(
+                    student_logits.float(), teacher_logits.float(), labels, temperature, alpha
+                )
+            optimizer.zero_grad()
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+            total_loss += loss.item()
+
+        logger.info(f"Distill epoch {epoch+1}, Loss: {total_loss / len(train_loader):.4f}")
+
+    atomic_save(student.checkpoint(), student_path)
+    logger.info(f"Saved student model to {student_path}")
@@ -0,0 +1,45 @@
+import logging
+import os
+
+from deepfake.exceptions import OperationalException
+from deepfake.deepfakeai.models.base_model import check_forward_parity
+from deepfake.deepfakeai.models.checkpoint import load_configured_model
+from deepfake.deepfakeai.models.onnx_backend import (
+    OnnxModel,
+    check_onnx_parity,
+    export_onnx,
+    onnx_model_path
+)
+
+logger = logging.getLogger(__name__)
+
+
+def export_model(config: dict[str, dict]):
+    """
+    Export the ``model_name`` checkpoint to ONNX (``<model_name>.onnx`` in modelsdir)
+    and check it against the PyTorch model with ONNX Runtime
+    """
+    models_dir = config["modelsdir"]
+    model_name = f"{config['model_name']}.pth"
+    model_path = os.path.join(str(models_dir), model_name)
+
+    if not os.path.exists(model_path):
+        raise OperationalException(f"Model file {model_name} not found in {models_dir}, train the model first.")
+
+    models_config = config.get("models", {})
+    # micro_batch is left unset: the exported graph runs all frames in one pass
+    # over the full ViT token sequence
+    model = load_configured_model(config, model_path, "cpu", micro_batch=None, vit_token_budget=None)
+    if hasattr(model, "forward_loop"):
+        # The exported graph is the vectorized forward: check it against the per-timestep loop first
+        check_forward_parity(model)
+
+    onnx_path = onnx_model_path(model_path)
+    export_onnx(model, onnx_path, image_size=model.image_size)
+
+    try:
+        onnx_model = OnnxModel(onnx_path, num_threads=models_config.get("onnx_threads"))
+    except OperationalException as e:
+        logger.warning(f"Skipping the ONNX parity check: {e}")
+        return
+    check_onnx_parity(onnx_model, model, image_size=model.image_size)
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import os
+import time
 import random
+import shutil
 import cv2
 import json
 import dlib
@@ -11,12 +13,31 @@ from tqdm import tqdm
 import multiprocessing
 from imutils import face_utils
 from functools import partial
+from contextlib import contextmanager
 from deepfake.constants import FACE_PREDICTOR_NAME
+from deepfake.deepfakeai.utils.manifest import ExtractionManifest, MANIFEST_NAME
+from deepfake.deepfakeai.utils.landmarks import build_landmark_store
+from deepfake.deepfakeai.utils.shards import ShardWriter, SHARD_SAMPLES, SHARD_DIR
 
 logger = logging.getLogger(__name__)
 
 # ====== Configuration ======
 NUM_FRAMES = 10  
+DECODE_MODE = "grab"        # "grab": grab forward without retrieving, "seek": jump to far target frames
+SEEK_MIN_GAP = 250          # GOP estimate (x264 default keyint): closer targets are grabbed, not sought
+LANDMARK_SHARD_NAME = "ldm.jsonl"
+DETECT_MODE = "full"        # "full": detect on every full frame, "cascade": track + downscaled detection
+DETECT_SCALE = 0.5          # Frame scale used for the downscaled detection pass
+TRACK_MARGIN = 0.5          # Search region around the previous face, in face box sizes per side
+TRACK_MIN_SCORE = 0.3       # Minimum detector score to accept a tracked face
+OUTPUT_MODE = "frame"       # "frame": full BGR frame, "crop": aligned face crop
+CROP_SIZE = 224             # Side of the square face crop in pixels
+CROP_MARGIN = 0.3           # Padding around the landmark box, as a fraction of its size
+IMAGE_FORMAT = "png"        # "png", "jpg" or "webp"
+OUTPUT_FORMAT = "files"     # "files": one image file per frame, "shards": packed tar shards
+STAGES = ("decode", "detect", "landmark", "write")
+LEFT_EYE = slice(36, 42)    # 68/81-point landmark indices
+RIGHT_EYE = slice(42, 48)
 
 # ====== Helper Functions ======
 def parse_video_path(videos_path: str, dataset: str):
@@ -38,7 +59,202 @@ def parse_labels(video_path):
 def get_output_dir(label, save_images_path):
     return os.path.join(save_images_path, 'real' if label == 0 else 'fake')
 
-def preprocess_video(video_path, save_images_path, face_detector, face_predictor):
+def new_video_stats(frame_count=0):
+    """
+    Per-video extraction counters and per-stage timings (seconds)
+    """
+    stats = {
+        "frames": frame_count, "decoded": 0, "kept": 0, "seeks": 0,
+        "tracked": 0, "downscaled": 0, "full": 0,
+    }
+    stats.update({f"{stage}_s": 0.0 for stage in STAGES})
+    return stats
+
+def sample_frame_indices(frame_count, num_frames=NUM_FRAMES):
+    """
+    Return the sorted, unique frame indices to keep from a video
+    """
+    if frame_count < num_frames:
+        return list(range(frame_count))
+    idxs = np.linspace(0, frame_count - 1, num_frames, endpoint=True, dtype=int)
+    return sorted(set(idxs.tolist()))
+
+def read_sampled_frames(cap, frame_idxs, stats, decode_mode=DECODE_MODE, seek_min_gap=SEEK_MIN_GAP):
+    """
+    Yield (frame_idx, frame) for the requested frame indices only.
+
+    Frames between two targets are skipped with ``cap.grab()`` (no retrieve / color
+    conversion), or with a seek when the gap exceeds ``seek_min_gap``. The FFmpeg
+    backend seeks to the preceding keyframe and decodes forward to the target
+    internally, so a seek only pays off when the gap spans more than a GOP;
+    shorter gaps would re-decode from the same keyframe for every target.
+    A backend reporting a position before the target is grabbed forward from
+    there; any other position disables seeking and restarts from frame 0.
+
+    ``stats`` is updated in place: "decoded" counts the frames grabbed / read
+    here, not the frames decoded inside a seek (their cost is in the decode
+    stage time), "seeks" counts the seeks.
+    """
+    position = 0
+    use_seek = decode_mode == "seek"
+
+    for target in frame_idxs:
+        if use_seek and target - position > seek_min_gap:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            stats["seeks"] += 1
+            landed = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if position <= landed <= target:
+                position = landed
+            else:
+                logger.debug(f"Inexact seek to frame {target} (landed on {landed}), falling back to grab")
+                use_seek = False
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                position = 0
+
+        while position < target:
+            if not cap.grab():
+                logger.error(f"Frame grab error at frame {position}")
+                return
+            stats["decoded"] += 1
+            position += 1
+
+        ret, frame = cap.read()
+        position += 1
+        if not ret:
+            logger.error(f"Frame read error at frame {target}")
+            continue
+        stats["decoded"] += 1
+        yield target, frame
+
+def scale_rect(rect, scale=1.0, offset_x=0, offset_y=0):
+    """
+    Map a dlib rectangle from a resized / cropped image back to frame coordinates
+    """
+    return dlib.rectangle(
+        int(rect.left() / scale) + offset_x,
+        int(rect.top() / scale) + offset_y,
+        int(rect.right() / scale) + offset_x,
+        int(rect.bottom() / scale) + offset_y,
+    )
+
+def track_region(prev_box, frame_shape, margin=TRACK_MARGIN):
+    """
+    Search region around the previous face box, grown by ``margin`` box sizes per side
+    """
+    h, w = frame_shape[:2]
+    dx, dy = int(prev_box.width() * margin), int(prev_box.height() * margin)
+    x0, y0 = max(0, prev_box.left() - dx), max(0, prev_box.top() - dy)
+    x1, y1 = min(w, prev_box.right() + dx), min(h, prev_box.bottom() + dy)
+    return x0, y0, x1, y1
+
+def detect_faces_cascade(rgb_frame, face_detector, prev_box, stats,
+                         detect_scale=DETECT_SCALE, min_score=TRACK_MIN_SCORE):
+    """
+    Cheapest-first face detection, boxes are returned in full frame coordinates:
+
+    1. search the region around the previous frame's face (tracking),
+    2. detect on a downscaled copy of the frame,
+    3. full resolution detection with one upsample (the "full" mode behaviour).
+    """
+    if prev_box is not None:
+        x0, y0, x1, y1 = track_region(prev_box, rgb_frame.shape)
+        region = np.ascontiguousarray(rgb_frame[y0:y1, x0:x1])
+        dets, scores, _ = face_detector.run(region, 0, 0)
+        if len(dets) > 0 and max(scores) >= min_score:
+            stats["tracked"] += 1
+            return [scale_rect(d, 1.0, x0, y0) for d in dets]
+
+    small = cv2.resize(rgb_frame, None, fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA)
+    dets = face_detector(small, 1)
+    if len(dets) > 0:
+        stats["downscaled"] += 1
+        return [scale_rect(d, detect_scale) for d in dets]
+
+    stats["full"] += 1
+    return list(face_detector(rgb_frame, 1))
+
+def align_face(frame, landmark, crop_size=CROP_SIZE, margin=CROP_MARGIN):
+    """
+    Rotate the face so the eyes are level and crop a margin-padded square around
+    the landmarks, resized to ``crop_size``. Done as a single affine warp.
+
+    Returns the crop and the landmarks mapped into crop coordinates.
+    """
+    landmark = landmark.astype(np.float32)
+    left_eye = landmark[LEFT_EYE].mean(axis=0)
+    right_eye = landmark[RIGHT_EYE].mean(axis=0)
+    angle = np.degrees(np.arctan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0]))
+
+    (x0, y0), (x1, y1) = landmark.min(axis=0), landmark.max(axis=0)
+    center = ((x0 + x1) / 2, (y0 + y1) / 2)
+    box_size = max(x1 - x0, y1 - y0) * (1 + 2 * margin)
+    scale = crop_size / max(box_size, 1.0)
+
+    matrix = cv2.getRotationMatrix2D(center, angle, scale)
+    matrix[0, 2] += crop_size / 2 - center[0]
+    matrix[1, 2] += crop_size / 2 - center[1]
+
+    crop = cv2.warpAffine(frame, matrix, (crop_size, crop_size), flags=cv2.INTER_LINEAR)
+    crop_landmark = np.hstack([landmark, np.ones((len(landmark), 1), np.float32)]) @ matrix.T
+    return crop, np.rint(crop_landmark).astype(int)
+
+def encode_params(image_format=IMAGE_FORMAT, image_quality=None, png_compression=None):
+    """
+    cv2.imwrite parameters for the configured codec: ``image_quality`` (0-100)
+    for jpg / webp, ``png_compression`` (level 0-9) for the lossless png
+    """
+    if image_format == "png":
+        if png_compression is None:
+            return []
+        if not 0 <= int(png_compression) <= 9:
+            raise ValueError(f"png_compression must be between 0 and 9, got {png_compression}")
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+
+    quality_flags = {
+        "jpg": cv2.IMWRITE_JPEG_QUALITY,
+        "webp": cv2.IMWRITE_WEBP_QUALITY,
+    }
+    if image_format not in quality_flags:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    if image_quality is None:
+        return []
+    if not 0 <= int(image_quality) <= 100:
+        raise ValueError(f"image_quality must be between 0 and 100, got {image_quality}")
+    return [quality_flags[image_format], int(image_quality)]
+
+@contextmanager
+def stage_timer(stats, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[f"{stage}_s"] += time.perf_counter() - start
+
+def timed_iter(iterable, stats, stage):
+    """
+    Charge the time spent producing each item of ``iterable`` to ``stage``
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage_timer(stats, stage):
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+def preprocess_video(video_path, save_images_path, face_detector, face_predictor,
+                     decode_mode=DECODE_MODE, seek_min_gap=SEEK_MIN_GAP, detect_mode=DETECT_MODE,
+                     output_mode=OUTPUT_MODE,
+                     crop_size=CROP_SIZE, crop_margin=CROP_MARGIN, image_format=IMAGE_FORMAT,
+                     image_quality=None, png_compression=None, output_format=OUTPUT_FORMAT):
+    """
+    Extract the sampled frames of one video and the landmarks of their largest face.
+
+    In "crop" output mode an aligned face crop is written instead of the full frame
+    and the stored landmarks are in crop coordinates. In "shards" output format the
+    encoded image is returned in the metadata ("image") for the parent to pack
+    instead of being written to its own file.
+    """
     label = parse_labels(video_path)
     save_dir = get_output_dir(label, save_images_path)
     os.makedirs(save_dir, exist_ok=True)
@@ -49,38 +265,43 @@ def preprocess_video(video_path, save_images_path, face_detector, face_predictor
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     if frame_count < NUM_FRAMES:
         logger.warning(f"Video {video_name} has only {frame_count} frames, less than {NUM_FRAMES}")
-        frame_idxs = np.arange(0, frame_count)
-    else:
-        frame_idxs = np.linspace(0, frame_count - 1, NUM_FRAMES, endpoint=True, dtype=int)
+    frame_idxs = sample_frame_indices(frame_count)
 
     video_meta_dict = {}
-
-    for cnt_frame in range(frame_count):
-        ret, frame = cap.read()
-        if not ret:
-            logger.error(f"Frame read error at frame {cnt_frame}: {video_path}")
-            continue
-        if cnt_frame not in frame_idxs:
-            continue
-
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        faces = face_detector(rgb_frame, 1)
+    write_params = encode_params(image_format, image_quality, png_compression)
+    stats = new_video_stats(frame_count)
+    prev_box = None
+
+    sampled_frames = read_sampled_frames(
+        cap, frame_idxs, stats, decode_mode=decode_mode, seek_min_gap=seek_min_gap
+    )
+    for cnt_frame, frame in timed_iter(sampled_frames, stats, "decode"):
+        with stage_timer(stats, "detect"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if detect_mode == "cascade":
+                faces = detect_faces_cascade(rgb_frame, face_detector, prev_box, stats)
+                # Only the largest face is kept, so only run the predictor on it
+                faces = [max(faces, key=lambda r: r.area())] if faces else []
+            else:
+                faces = face_detector(rgb_frame, 1)
 
         if len(faces) == 0:
             logger.warning(f"No faces in frame {cnt_frame} of {video_name}")
+            prev_box = None
             continue
 
         landmarks = []
         face_sizes = []
 
-        for face in faces:
-            shape = face_predictor(rgb_frame, face)
-            shape_np = face_utils.shape_to_np(shape)
-            x0, y0 = shape_np[:, 0].min(), shape_np[:, 1].min()
-            x1, y1 = shape_np[:, 0].max(), shape_np[:, 1].max()
-            face_area = (x1 - x0) * (y1 - y0)
-            face_sizes.append(face_area)
-            landmarks.append(shape_np)
+        with stage_timer(stats, "landmark"):
+            for face in faces:
+                shape = face_predictor(rgb_frame, face)
+                shape_np = face_utils.shape_to_np(shape)
+                x0, y0 = shape_np[:, 0].min(), shape_np[:, 1].min()
+                x1, y1 = shape_np[:, 0].max(), shape_np[:, 1].max()
+                face_area = (x1 - x0) * (y1 - y0)
+                face_sizes.append(face_area)
+                landmarks.append(shape_np)
 
         if not face_sizes:
             continue
@@ -88,43 +309,160 @@ def preprocess_video(video_path, save_images_path, face_detector, face_predictor
         landmarks = np.array(landmarks)
         largest_face_idx = np.argmax(face_sizes)
         chosen_landmark = landmarks[largest_face_idx]
+        prev_box = faces[largest_face_idx]
 
-        # Save image as: videoName_frameNumber.png
-        img_filename = f"{video_name}_frame_{cnt_frame}.png"
+        # Save image as: videoName_frame_frameNumber.<image_format>
+        img_filename = f"{video_name}_frame_{cnt_frame}.{image_format}"
         img_path = os.path.join(save_dir, img_filename)
         meta_key = os.path.join(os.path.basename(save_images_path), os.path.basename(save_dir), img_filename)
 
-        # Save frame
-        cv2.imwrite(img_path, frame)
+        # Save frame (or aligned face crop)
+        with stage_timer(stats, "write"):
+            if output_mode == "crop":
+                frame, chosen_landmark = align_face(frame, chosen_landmark, crop_size, crop_margin)
+            if output_format == "shards":
+                image_bytes = cv2.imencode(f".{image_format}", frame, write_params)[1].tobytes()
+            else:
+                cv2.imwrite(img_path, frame, write_params)
 
         # Collect metadata
         video_meta_dict[meta_key] = {
             "landmark": chosen_landmark.tolist(),
             "label": label
         }
+        if output_format == "shards":
+            video_meta_dict[meta_key]["image"] = image_bytes
+        stats["kept"] += 1
 
     cap.release()
-    return video_meta_dict
+    logger.debug(
+        f"{video_name}: read {stats['decoded']}/{frame_count} frames,"
+        f" kept {stats['kept']} ({stats['seeks']} seeks, decode {stats['decode_s']:.2f}s)"
+    )
+    return video_meta_dict, stats
 
 # ====== Extract Frames ======
 
-def process_video(video_path, save_images_path, face_detector, face_predictor):
-    return preprocess_video(str(video_path), str(save_images_path), face_detector, face_predictor)
+# Per-process dlib models, populated by init_worker() in every pool worker
+_face_detector = None
+_face_predictor = None
+
+def init_worker(predictor_path):
+    """
+    Pool initializer: load the face detector and landmark predictor once per
+    worker process instead of shipping them with every task.
+    """
+    global _face_detector, _face_predictor
+    _face_detector = dlib.get_frontal_face_detector()
+    _face_predictor = dlib.shape_predictor(str(predictor_path))
+
+def process_video(task, **options):
+    """
+    Worker entry point for one (video_path, save_images_path, split) task.
+    Returns the video path and split together with the frame metadata so the
+    parent can route results arriving in any order.
+    """
+    video_path, save_images_path, split = task
+    video_meta, stats = preprocess_video(
+        str(video_path), str(save_images_path), _face_detector, _face_predictor, **options
+    )
+    return video_path, split, video_meta, stats
+
+def write_landmark_records(shard, video_meta):
+    """
+    Append one JSON line per extracted frame to an open landmark shard.
+    Re-processed videos append new records; readers keep the last record per key.
+    """
+    for meta_key, meta in video_meta.items():
+        record = {"key": meta_key, "landmark": meta["landmark"], "label": meta["label"]}
+        shard.write(json.dumps(record) + "\n")
+    shard.flush()
+
+def output_options(extract_config):
+    """
+    Output image options passed through to preprocess_video
+    """
+    return {
+        "output_mode": extract_config.get("output_mode", OUTPUT_MODE),
+        "crop_size": extract_config.get("crop_size", CROP_SIZE),
+        "crop_margin": extract_config.get("crop_margin", CROP_MARGIN),
+        "image_format": extract_config.get("image_format", IMAGE_FORMAT),
+        "image_quality": extract_config.get("image_quality"),
+        "png_compression": extract_config.get("png_compression"),
+        "output_format": extract_config.get("output_format", OUTPUT_FORMAT),
+    }
+
+def extraction_settings(extract_config):
+    """
+    Extractor settings that change the produced frames. A video processed with
+    different settings is extracted again.
+    """
+    return {
+        "num_frames": NUM_FRAMES,
+        "detect_mode": extract_config.get("detect_mode", DETECT_MODE),
+        **output_options(extract_config),
+    }
+
+def remove_stale_frames(save_images_path, frames):
+    for meta_key in frames:
+        img_path = os.path.join(str(save_images_path), meta_key)
+        if os.path.isfile(img_path):
+            os.remove(img_path)
+
+def build_landmark_stores(save_images_path, manifest, splits):
+    """
+    Compile each split's landmark shard into the binary store, keeping only the
+    frames the manifest still lists for that split.
+    """
+    for split in splits:
+        valid_keys = {
+            key
+            for record in manifest.records.values() if record["split"] == split
+            for key in record["frames"]
+        }
+        count = build_landmark_store(save_images_path / split, LANDMARK_SHARD_NAME, valid_keys)
+        logger.info(f"Binary landmark store for {split}: {count} frames")
 
 def extract_frames(config: dict):
     predictor_path = config["modelsdir"] / FACE_PREDICTOR_NAME
-    face_detector = dlib.get_frontal_face_detector()
-    face_predictor = dlib.shape_predictor(str(predictor_path))
+    if not predictor_path.is_file():
+        raise FileNotFoundError(
+            f"Face predictor {FACE_PREDICTOR_NAME} not found in {config['modelsdir']},"
+            f" Please run create-userdir first."
+        )
 
     datasets = config["datasets"]
     videos_path = config["datadir"]
     save_images_path = config["imgdir"]
 
+    extract_config = config.get("extract", {})
+    decode_mode = extract_config.get("decode_mode", DECODE_MODE)
+    seek_min_gap = extract_config.get("seek_min_gap", SEEK_MIN_GAP)
+    detect_mode = extract_config.get("detect_mode", DETECT_MODE)
+    num_workers = extract_config.get("workers") or multiprocessing.cpu_count()
+    split_seed = extract_config.get("split_seed", 0)
+    force = extract_config.get("force", False)
+    settings = extraction_settings(extract_config)
+    # Fail on an unsupported format / quality here instead of in every worker
+    encode_params(settings["image_format"], settings["image_quality"], settings["png_compression"])
+    if settings["image_format"] == "png" and settings["image_quality"] is not None:
+        logger.warning("extract.image_quality only applies to jpg / webp, use extract.png_compression for png")
     train_size_pcr = config.get("train_size_pcr", 0.8)
     dataset_size = config["dataset_size"]
 
-    train_video_paths_to_process = []
-    test_video_paths_to_process = []
+    splits = ["train", "test"]
+    for split in splits:
+        os.makedirs(save_images_path / split, exist_ok=True)
+
+    if force and settings["output_format"] == "shards":
+        # Shards are append-only, re-extracting everything must start from empty shards
+        for split in splits:
+            shutil.rmtree(save_images_path / split / SHARD_DIR, ignore_errors=True)
+
+    manifest = ExtractionManifest(save_images_path / MANIFEST_NAME)
+    video_tasks = []
+    pending = {}
+    skipped = 0
 
     for dataset in datasets:
         all_video_list = parse_video_path(str(videos_path), dataset)
@@ -135,52 +473,119 @@ def extract_frames(config: dict):
             )
 
         video_list = all_video_list[:dataset_size]
+        video_keys = {v: os.path.relpath(v, str(videos_path)) for v in video_list}
 
-        # Split dataset into 80% train and 20% test
+        # Videos seen in an earlier run keep their split, so previous outputs stay valid
+        known_splits = {
+            v: manifest.get(video_keys[v])["split"]
+            for v in video_list if video_keys[v] in manifest
+        }
+        new_videos = [v for v in video_list if v not in known_splits]
+
+        # Split dataset into 80% train and 20% test (seeded, only new videos are drawn)
         train_size = int(train_size_pcr * len(video_list))
-        train_videos = random.sample(video_list, train_size)
-        test_videos = [v for v in video_list if v not in train_videos]
-
-        # Process train videos
-        train_path = save_images_path / "train"
-        os.makedirs(train_path, exist_ok=True)
-        for video_path in train_videos:
-            train_video_paths_to_process.append((video_path, train_path))
-
-        # Process test videos
-        test_path = save_images_path / "test"
-        os.makedirs(test_path, exist_ok=True)
-        for video_path in test_videos:
-            test_video_paths_to_process.append((video_path, test_path))
-
-    pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
-    process_fn = partial(process_video, face_detector=face_detector, face_predictor=face_predictor)
-
-    train_meta = {}
-    test_meta = {}
-
-    # Process TRAIN
-    with tqdm(total=len(train_video_paths_to_process), desc="Processing TRAIN videos") as pbar:
-        results = pool.starmap(process_fn, train_video_paths_to_process)
-        for video_meta in results:
-            train_meta.update(video_meta)
-            pbar.update(1)
-
-    # Process TEST
-    with tqdm(total=len(test_video_paths_to_process), desc="Processing TEST videos") as pbar:
-        results = pool.starmap(process_fn, test_video_paths_to_process)
-        for video_meta in results:
-            test_meta.update(video_meta)
-            pbar.update(1)
-
-    pool.close()
-    pool.join()
-
-    # Save metadata separately
-    with open(os.path.join(str(save_images_path), "train", "ldm.json"), 'w') as f:
-        json.dump(train_meta, f, indent=4)
-
-    with open(os.path.join(str(save_images_path), "test", "ldm.json"), 'w') as f:
-        json.dump(test_meta, f, indent=4)
-
-    logger.info("Metadata saved: ldm_train.json and ldm_test.json")
+        known_train = sum(1 for s in known_splits.values() if s == "train")
+        new_train_size = min(max(train_size - known_train, 0), len(new_videos))
+        rng = random.Random(f"{split_seed}:{dataset}")
+        train_videos = set(rng.sample(new_videos, new_train_size))
+
+        for video_path in video_list:
+            split = known_splits.get(video_path) or ("train" if video_path in train_videos else "test")
+            video_key = video_keys[video_path]
+            fingerprint, stat = manifest.fingerprint(video_key, video_path)
+
+            if not force and manifest.is_current(video_key, fingerprint, settings):
+                skipped += 1
+                continue
+
+            record = manifest.get(video_key)
+            if record:
+                remove_stale_frames(save_images_path, record["frames"])
+
+            pending[video_path] = (video_key, fingerprint, stat)
+            video_tasks.append((video_path, save_images_path / split, split))
+
+    logger.info(f"{skipped} videos unchanged since the last run, {len(video_tasks)} to process")
+    if not video_tasks:
+        build_landmark_stores(save_images_path, manifest, splits)
+        return
+
+    # Landmark shards are appended as JSON lines while videos complete,
+    # so a crash only loses the videos still in flight.
+    landmark_shards = {
+        split: open(save_images_path / split / LANDMARK_SHARD_NAME, "a")
+        for split in splits
+    }
+    image_shards = {}
+    if settings["output_format"] == "shards":
+        image_shards = {
+            split: ShardWriter(
+                save_images_path / split,
+                max_samples=extract_config.get("shard_samples", SHARD_SAMPLES)
+            )
+            for split in splits
+        }
+    total_stats = new_video_stats()
+    process_fn = partial(
+        process_video,
+        decode_mode=decode_mode,
+        seek_min_gap=seek_min_gap,
+        detect_mode=detect_mode,
+        **output_options(extract_config)
+    )
+
+    logger.info(f"Extracting frames from {len(video_tasks)} videos with {num_workers} worker processes")
+    try:
+        with multiprocessing.Pool(
+            processes=num_workers,
+            initializer=init_worker,
+            initargs=(str(predictor_path),)
+        ) as pool:
+            results = pool.imap_unordered(process_fn, video_tasks)
+            for video_path, split, video_meta, stats in tqdm(
+                results, total=len(video_tasks), desc="Processing videos"
+            ):
+                video_key, fingerprint, stat = pending.pop(video_path)
+                if image_shards:
+                    shard_of = {}
+                    for meta_key, meta in video_meta.items():
+                        # Member name "{real,fake}/<file>", relative to the split directory
+                        member_name = meta_key.split(os.sep, 1)[1]
+                        shard_of[meta_key] = image_shards[split].write(member_name, meta.pop("image"))
+                    # Recorded once its images are in a closed shard: after a hard kill the
+                    # video is extracted again instead of pointing at a truncated shard
+                    image_shards[split].on_close(partial(
+                        manifest.add, video_key, fingerprint, stat, split, list(video_meta), settings,
+                        shards=shard_of
+                    ))
+                else:
+                    manifest.add(video_key, fingerprint, stat, split, list(video_meta), settings)
+                write_landmark_records(landmark_shards[split], video_meta)
+                for key in total_stats:
+                    total_stats[key] += stats[key]
+    finally:
+        for shard in landmark_shards.values():
+            shard.close()
+        for writer in image_shards.values():
+            writer.close()
+        manifest.close()
+
+    manifest.compact()
+    build_landmark_stores(save_images_path, manifest, splits)
+
+    logger.info(f"Landmark metadata saved: {', '.join(f'{s}/{LANDMARK_SHARD_NAME}' for s in splits)}")
+    logger.info(
+        f"Read {total_stats['decoded']} of {total_stats['frames']} frames"
+        f" ({decode_mode} mode, {total_stats['seeks']} seeks), kept {total_stats['kept']}"
+        + (" (frames decoded inside seeks are not counted, see the decode stage time)"
+           if total_stats["seeks"] else "")
+    )
+    if detect_mode == "cascade":
+        logger.info(
+            f"Face detection: {total_stats['tracked']} tracked,"
+            f" {total_stats['downscaled']} downscaled, {total_stats['full']} full resolution"
+        )
+    # Stage timings are summed over all workers (CPU seconds, not wall time)
+    logger.info("Stage timings: " + ", ".join(
+        f"{stage} {total_stats[f'{stage}_s']:.1f}s" for stage in STAGES
+    ))
@@ -0,0 +1,43 @@
+import logging
+import os
+
+import timm
+import torch
+
+from deepfake.deepfakeai.utils.files import atomic_save
+
+logger = logging.getLogger(__name__)
+
+PRETRAINED_DIR = "pretrained"
+
+
+def pretrained_weights_dir(config):
+    """
+    Local cache of pretrained backbone weights: models.pretrained_dir, else modelsdir/pretrained
+    """
+    return config.get("models", {}).get("pretrained_dir") or str(config["modelsdir"] / PRETRAINED_DIR)
+
+
+def create_backbone(backbone, pretrained=True, weights_dir=None, **kwargs):
+    """
+    Create a timm backbone.
+
+    - ``pretrained`` False: random init, no download (weights come from a checkpoint)
+    - ``weights_dir`` set: ImageNet weights are loaded from ``{weights_dir}/{backbone}.pth``;
+      on a miss they are downloaded once and saved there, so later runs work offline
+    """
+    if not pretrained or weights_dir is None:
+        return timm.create_model(backbone, pretrained=pretrained, **kwargs)
+
+    weights_path = os.path.join(str(weights_dir), f"{backbone}.pth")
+    if os.path.isfile(weights_path):
+        model = timm.create_model(backbone, pretrained=False, **kwargs)
+        model.load_state_dict(torch.load(weights_path, map_location="cpu"))
+        logger.info(f"Loaded pretrained {backbone} weights from {weights_path}")
+        return model
+
+    model = timm.create_model(backbone, pretrained=True, **kwargs)
+    os.makedirs(str(weights_dir), exist_ok=True)
+    atomic_save(model.state_dict(), weights_path)
+    logger.info(f"Cached pretrained {backbone} weights in {weights_path}")
+    return model
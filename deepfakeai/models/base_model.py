@@ -20,15 +20,48 @@ class CNN_ViT_LSTM(nn.Module):
 
     Input:  Tensor [B, Seq, C, H, W]
     Output: Tensor [B, num_classes]
+
+    All frames of a batch go through the backbones together, in chunks of at
+    most ``micro_batch`` frames (None = all at once) to cap peak memory.
+
+    ``pretrained`` False builds the backbones without ImageNet weights (use
+    checkpoint.load_model to load a trained model), ``weights_dir`` is the local
+    cache of pretrained backbone weights.
+
+    ``aux_head`` adds a light classifier on the frame-averaged CNN features,
+    used by forward_cascade to skip the ViT and LSTM for confident inputs.
+    ``vit_token_budget`` enables ViT token merging (see ViTExtractor).
+    ``image_size`` is the input resolution; it is stored in the checkpoint and
+    the ViT position embeddings are interpolated to it.
     """
     def __init__(
         self,
         cnn_backbone='xception',                     # Default: efficient CNN
         vit_backbone='vit_tiny_patch16_224',         # Default: light ViT
         hidden_dim=256,
-        num_classes=2
+        num_classes=2,
+        micro_batch=None,
+        pretrained=True,
+        weights_dir=None,
+        aux_head=False,
+        vit_token_budget=None,
+        image_size=224
     ):
         super().__init__()
+        self.micro_batch = micro_batch
+        self.vit_token_budget = vit_token_budget
+        self.cnn_backbone = cnn_backbone
+        self.vit_backbone = vit_backbone
+        self.image_size = image_size
+        # Architecture arguments, stored in the checkpoint
+        self.model_config = {
+            "cnn_backbone": cnn_backbone,
+            "vit_backbone": vit_backbone,
+            "hidden_dim": hidden_dim,
+            "num_classes": num_classes,
+            "aux_head": aux_head,
+            "image_size": image_size
+        }
 
         # Detect CNN output dim based on backbone name
         if 'xception' in cnn_backbone:
@@ -54,8 +87,13 @@ class CNN_ViT_LSTM(nn.Module):
         else:
             vit_out_dim = 512  # Fallback
 
-        self.cnn = CNNExtractor(cnn_backbone, out_dim=cnn_out_dim)
-        self.vit = ViTExtractor(vit_backbone, out_dim=vit_out_dim)
+        self.cnn = CNNExtractor(
+            cnn_backbone, out_dim=cnn_out_dim, pretrained=pretrained, weights_dir=weights_dir
+        )
+        self.vit = ViTExtractor(
+            vit_backbone, out_dim=vit_out_dim, pretrained=pretrained, weights_dir=weights_dir,
+            token_budget=vit_token_budget, image_size=image_size
+        )
 
         # LSTM input is CNN + ViT features
         combined_feature_dim = cnn_out_dim + vit_out_dim
@@ -70,32 +108,163 @@ class CNN_ViT_LSTM(nn.Module):
             num_classes=num_classes
         )
 
+        # Early-exit head on the CNN features only
+        self.cnn_out_dim = cnn_out_dim
+        self.aux_classifier = ClassifierHead(cnn_out_dim, num_classes) if aux_head else None
+
         logger.info(f"[INFO] CNN_ViT_LSTM initialized with:")
         logger.info(f"       CNN output dim: {cnn_out_dim}")
         logger.info(f"       ViT output dim: {vit_out_dim}")
         logger.info(f"       LSTM input dim: {combined_feature_dim}")
 
+    def checkpoint(self):
+        """
+        Weights plus architecture, loadable with checkpoint.load_model
+        """
+        return {
+            "architecture": "cnn_vit_lstm",
+            "model_config": dict(self.model_config),
+            "state_dict": self.state_dict()
+        }
 
-    def forward(self, x_seq):
+    def forward(self, x_seq, lengths=None):
         """
         Forward pass for sequential image data.
 
         Args:
             x_seq: Tensor of shape [B, Seq, C, H, W]
+            lengths: Optional tensor [B] of valid steps for right-padded sequences
 
         Returns:
             Output logits: Tensor of shape [B, num_classes]
         """
+        features = self.extract_features(x_seq, lengths)  # [B, Seq, combined_dim]
+        return self.forward_features(features, lengths)
+
+    def forward_features(self, features, lengths=None):
+        """
+        LSTM + classifier on precomputed per-frame features [B, Seq, combined_dim]
+        (e.g. from the frozen-backbone feature cache)
+        """
+        temporal_out = self.temporal(features, lengths)  # [B, hidden_dim]
+        return self.classifier(temporal_out)   # [B, num_classes]
+
+    def aux_logits(self, features, lengths=None):
+        """
+        Early-exit logits [B, num_classes] from the CNN part of per-frame
+        features [B, Seq, combined_dim], averaged over the valid steps
+        """
+        cnn_feats = features[..., :self.cnn_out_dim]
+        if lengths is None:
+            return self.aux_classifier(cnn_feats.mean(dim=1))
+        # Padded steps hold zero features, so the sum only covers valid steps
+        lengths = lengths.to(features.device).clamp(min=1)
+        return self.aux_classifier(cnn_feats.sum(dim=1) / lengths[:, None].to(cnn_feats.dtype))
+
+    def forward_cascade(self, x_seq, band=(0.1, 0.9)):
+        """
+        Cascade inference for unpadded sequences [B, Seq, C, H, W].
+
+        The aux head scores the CNN features first; only sequences whose fake
+        probability lies inside ``band`` also run the ViT and LSTM.
+        Returns (logits [B, num_classes], exited [B] bool: aux head answered).
+        """
         B, S, C, H, W = x_seq.shape
-        features = []
+        frames = x_seq.reshape(B * S, C, H, W)
+        cnn_feats = self._chunked(self.cnn, frames).view(B, S, -1)
+        logits = self.aux_classifier(cnn_feats.mean(dim=1))
+
+        fake_prob = torch.softmax(logits.float(), dim=1)[:, 1]
+        exited = (fake_prob < band[0]) | (fake_prob > band[1])
+        if not exited.all():
+            rest = ~exited
+            vit_feats = self._chunked(self.vit, x_seq[rest].reshape(-1, C, H, W)).view(int(rest.sum()), S, -1)
+            features = torch.cat((cnn_feats[rest], vit_feats.to(cnn_feats.dtype)), dim=2)
+            logits = logits.clone()
+            logits[rest] = self.forward_features(features).to(logits.dtype)
+        return logits, exited
 
-        for i in range(S):
+    def _chunked(self, module, frames):
+        if not self.micro_batch:
+            return module(frames)
+        return torch.cat([module(x) for x in frames.split(self.micro_batch)], dim=0)
+
+    def frame_features(self, frames):
+        """
+        CNN + ViT features of a flat frame batch [N, C, H, W] -> [N, cnn + vit]
+        """
+        if not self.micro_batch:
+            # Single pass, also keeps the batch axis dynamic in ONNX export
+            return torch.cat((self.cnn(frames), self.vit(frames)), dim=1)
+        feats = [
+            torch.cat((self.cnn(x), self.vit(x)), dim=1)
+            for x in frames.split(self.micro_batch)
+        ]
+        return torch.cat(feats, dim=0)
+
+    def extract_features(self, x_seq, lengths=None):
+        """
+        Per-frame features for a sequence batch, with the sequence dimension
+        folded into the batch for the backbone pass.
+
+        Padded steps (beyond ``lengths``) skip the backbones and get zero features.
+        Note: in training mode BatchNorm statistics are computed over B * Seq
+        frames instead of B frames per timestep.
+        """
+        B, S, C, H, W = x_seq.shape
+        if lengths is None:
+            feats = self.frame_features(x_seq.reshape(B * S, C, H, W))
+            return feats.view(B, S, -1)
+
+        mask = torch.arange(S, device=x_seq.device)[None, :] < lengths.to(x_seq.device)[:, None]
+        feats = self.frame_features(x_seq[mask])  # [valid frames, combined_dim]
+        features = feats.new_zeros(B, S, feats.shape[1])
+        features[mask] = feats
+        return features
+
+    def forward_loop(self, x_seq, lengths=None):
+        """
+        Reference implementation calling the backbones once per timestep
+        (the original forward), see check_forward_parity
+        """
+        features = []
+        for i in range(x_seq.shape[1]):
             x = x_seq[:, i]  # [B, C, H, W]
-            cnn_feat = self.cnn(x)  # [B, cnn_out_dim]
-            vit_feat = self.vit(x)  # [B, vit_out_dim]
-            feat = torch.cat((cnn_feat, vit_feat), dim=1)  # [B, cnn + vit]
+            feat = torch.cat((self.cnn(x), self.vit(x)), dim=1)  # [B, cnn + vit]
             features.append(feat.unsqueeze(1))  # [B, 1, combined_dim]
 
         features = torch.cat(features, dim=1)  # [B, Seq, combined_dim]
-        temporal_out = self.temporal(features)  # [B, hidden_dim]
-        return self.classifier(temporal_out)   # [B, num_classes]
+        return self.classifier(self.temporal(features, lengths))
+
+
+def check_forward_parity(model, image_size=None, seq_len=3, micro_batch=2, atol=1e-4):
+    """
+    Compare the vectorized forward of a CNN_ViT_LSTM against the per-timestep
+    reference loop on a random batch, with micro_batch off and on and with
+    full and right-padded lengths. Returns the max absolute logit difference
+    and logs a warning above ``atol``.
+    """
+    image_size = image_size or model.image_size
+    device = next(model.parameters()).device
+    x_seq = torch.randn(2, seq_len, 3, image_size, image_size, device=device)
+    padded = torch.tensor([seq_len, max(seq_len - 1, 1)])
+
+    was_training, model_micro_batch = model.training, model.micro_batch
+    model.eval()
+    diff = 0.0
+    try:
+        with torch.no_grad():
+            for lengths in (None, padded):
+                expected = model.forward_loop(x_seq, lengths)
+                for mb in (None, micro_batch):
+                    model.micro_batch = mb
+                    diff = max(diff, (model(x_seq, lengths) - expected).abs().max().item())
+    finally:
+        model.micro_batch = model_micro_batch
+        model.train(was_training)
+
+    if diff > atol:
+        logger.warning(f"Vectorized forward differs from the reference loop by {diff:.2e}")
+    else:
+        logger.info(f"Forward parity check passed (max diff {diff:.2e})")
+    return diff
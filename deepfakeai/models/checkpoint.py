@@ -0,0 +1,66 @@
+import torch
+
+from deepfake.exceptions import ConfigurationError
+
+from .base_model import CNN_ViT_LSTM
+from .student_model import StudentModel
+
+ARCHITECTURES = {
+    "cnn_vit_lstm": CNN_ViT_LSTM,
+    "student": StudentModel
+}
+
+
+def load_model(path, map_location=None, micro_batch=None, vit_token_budget=None, image_size=None, **defaults):
+    """
+    Build a trained model directly from its checkpoint, without pretrained
+    backbone weights (they are overwritten by the checkpoint anyway).
+
+    Checkpoints written by ``model.checkpoint()`` carry their architecture
+    (CNN_ViT_LSTM or StudentModel). Plain state_dict files are CNN_ViT_LSTM
+    models whose arguments come from ``defaults`` (e.g. the backbones of the config).
+    ``vit_token_budget`` enables ViT token merging on models with a ViT branch.
+
+    The input resolution is part of the checkpoint (224 for files without it);
+    an ``image_size`` that differs from it raises ConfigurationError.
+    """
+    checkpoint = torch.load(path, map_location=map_location)
+    if "state_dict" in checkpoint:
+        model_cls = ARCHITECTURES[checkpoint.get("architecture", "cnn_vit_lstm")]
+        model_config = checkpoint.get("model_config", {})
+        state_dict = checkpoint["state_dict"]
+    else:
+        model_cls, model_config, state_dict = CNN_ViT_LSTM, defaults, checkpoint
+
+    model_config = {k: v for k, v in model_config.items() if v is not None}
+    checkpoint_size = model_config.get("image_size", 224)
+    if image_size is not None and image_size != checkpoint_size:
+        raise ConfigurationError(
+            f"Model {path} was trained for {checkpoint_size}px input, the configured image_size is {image_size}px"
+        )
+    model = model_cls(**model_config, micro_batch=micro_batch, pretrained=False)
+    model.load_state_dict(state_dict)
+    if vit_token_budget and hasattr(model, "vit"):
+        model.vit_token_budget = vit_token_budget
+        model.vit.set_token_budget(vit_token_budget)
+    return model
+
+
+def load_configured_model(config, path, device, **overrides):
+    """
+    load_model with the settings of the ``models`` config section (micro_batch,
+    vit_token_budget, image_size and the backbones of plain state_dict files),
+    moved to ``device`` in eval mode. ``overrides`` replace single settings,
+    e.g. ``vit_token_budget=None``.
+    """
+    models_config = config.get("models", {})
+    settings = {
+        "micro_batch": models_config.get("micro_batch"),
+        "vit_token_budget": models_config.get("vit_token_budget"),
+        # Refuses checkpoints trained for another resolution
+        "image_size": models_config.get("image_size"),
+        "cnn_backbone": models_config.get("cnn_backbone"),
+        "vit_backbone": models_config.get("vit_backbone")
+    }
+    settings.update(overrides)
+    return load_model(path, map_location=device, **settings).to(device).eval()
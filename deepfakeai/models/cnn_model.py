@@ -1,5 +1,7 @@
+import torch
 import torch.nn as nn
-import timm
+
+from .backbone import create_backbone
 
 
 class CNNExtractor(nn.Module):
@@ -9,16 +11,24 @@ class CNNExtractor(nn.Module):
     def __init__(
         self,
         backbone='resnet18', 
-        out_dim=512
+        out_dim=512,
+        pretrained=True,
+        weights_dir=None
     ):
         super().__init__()
-        self.model = timm.create_model(
+        # pretrained=False skips the ImageNet weights when a checkpoint is loaded afterwards
+        self.model = create_backbone(
             backbone,
-            pretrained=True, 
+            pretrained=pretrained,
+            weights_dir=weights_dir,
             num_classes=0,
             global_pool='avg'
         )
         self.out_dim = out_dim
+        # Set by PrecisionPolicy, inputs are then converted to NHWC
+        self.channels_last = False
 
     def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
         return self.model(x)  # [B, out_dim]
\ No newline at end of file
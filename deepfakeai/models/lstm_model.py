@@ -1,3 +1,4 @@
+import torch
 import torch.nn as nn
 
 class TemporalLSTM(nn.Module):
@@ -19,7 +20,11 @@ class TemporalLSTM(nn.Module):
         )
         self.hidden_dim = hidden_dim
 
-    def forward(self, x_seq):
-        # x_seq: [B, Seq, input_dim]
+    def forward(self, x_seq, lengths=None):
+        # x_seq: [B, Seq, input_dim], lengths: [B] valid steps of right-padded sequences
         lstm_out, _ = self.lstm(x_seq)  # [B, Seq, hidden_dim]
-        return lstm_out[:, -1, :]       # Take last timestep output
+        if lengths is None:
+            return lstm_out[:, -1, :]   # Take last timestep output
+        # Last valid timestep of every sequence (padding comes after it)
+        last = (lengths.to(lstm_out.device) - 1).clamp(min=0)
+        return lstm_out[torch.arange(lstm_out.size(0), device=lstm_out.device), last]
@@ -0,0 +1,90 @@
+import logging
+import os
+
+import torch
+
+from deepfake.exceptions import OperationalException
+
+logger = logging.getLogger(__name__)
+
+ONNX_OPSET = 17
+INPUT_NAME = "frames"
+OUTPUT_NAME = "logits"
+
+
+def onnx_model_path(model_path):
+    root, _ = os.path.splitext(str(model_path))
+    return f"{root}.onnx"
+
+
+def export_onnx(model, onnx_path, image_size=224):
+    """
+    Export an eval-mode CNN_ViT_LSTM to ONNX.
+    Input ``frames`` [batch, sequence, 3, H, W] with dynamic batch and sequence
+    axes, output ``logits`` [batch, num_classes].
+    """
+    model = model.cpu().eval()
+    dummy = torch.randn(1, 2, 3, image_size, image_size)
+    tmp_path = f"{onnx_path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy,),
+            tmp_path,
+            input_names=[INPUT_NAME],
+            output_names=[OUTPUT_NAME],
+            dynamic_axes={INPUT_NAME: {0: "batch", 1: "sequence"}, OUTPUT_NAME: {0: "batch"}},
+            opset_version=ONNX_OPSET
+        )
+    # Write to a temporary file first so a failed export never replaces a working model
+    os.replace(tmp_path, onnx_path)
+    logger.info(f"Exported ONNX model to {onnx_path}")
+
+
+class OnnxModel:
+    """
+    CNN_ViT_LSTM exported to ONNX, run with ONNX Runtime on the CPU execution provider.
+
+    Called like the PyTorch model: float [B, Seq, C, H, W] tensor -> logits tensor
+    [B, num_classes], so Predictor code is shared between both backends.
+    ``num_threads`` (None = ORT default) caps the intra-op threads per session.
+    """
+    def __init__(self, onnx_path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise OperationalException("The 'onnx' backend needs the onnxruntime package")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, x_seq, lengths=None):
+        if lengths is not None:
+            raise ValueError("The ONNX model takes unpadded sequences only")
+        (logits,) = self.session.run([OUTPUT_NAME], {INPUT_NAME: x_seq.detach().cpu().numpy()})
+        return torch.from_numpy(logits)
+
+
+def check_onnx_parity(onnx_model, model, image_size=224, seq_len=3, atol=1e-3):
+    """
+    Compare ONNX Runtime against the PyTorch model on a random sequence batch.
+    Returns the max absolute logit difference and logs a warning above ``atol``.
+    """
+    x_seq = torch.randn(2, seq_len, 3, image_size, image_size)
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        expected = model(x_seq.to(next(model.parameters()).device)).cpu()
+    model.train(was_training)
+
+    diff = (onnx_model(x_seq) - expected).abs().max().item()
+    if diff > atol:
+        logger.warning(f"ONNX Runtime output differs from PyTorch by {diff:.2e}")
+    else:
+        logger.info(f"ONNX Runtime parity check passed (max diff {diff:.2e})")
+    return diff
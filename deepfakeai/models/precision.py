@@ -0,0 +1,118 @@
+import copy
+import logging
+import time
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = {
+    "fp32": None,
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16
+}
+
+
+class PrecisionPolicy:
+    """
+    Precision / memory-format policy shared by training, testing and prediction.
+
+    - ``precision``: "fp32", "bf16" (autocast, no loss scaling needed) or
+      "fp16" (autocast + GradScaler loss scaling)
+    - ``channels_last``: run the CNN backbone in NHWC memory format
+
+    Weights stay fp32; autocast only lowers the precision of matmuls / convolutions.
+    """
+    def __init__(self, precision="fp32", channels_last=False, device="cpu"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.precision = precision
+        self.channels_last = channels_last
+        self.device_type = torch.device(device).type
+
+    @classmethod
+    def from_config(cls, config, device):
+        models_config = config.get("models", {})
+        return cls(
+            precision=models_config.get("precision", "fp32"),
+            channels_last=models_config.get("channels_last", False),
+            device=device
+        )
+
+    def __str__(self):
+        return f"{self.precision}{'/channels_last' if self.channels_last else ''}"
+
+    def autocast(self):
+        dtype = PRECISIONS[self.precision]
+        return torch.autocast(self.device_type, dtype=dtype, enabled=dtype is not None)
+
+    def grad_scaler(self):
+        """
+        Loss scaler for fp16 (disabled, i.e. pass-through, otherwise)
+        """
+        return torch.amp.GradScaler(self.device_type, enabled=self.precision == "fp16")
+
+    def prepare_model(self, model):
+        """
+        Switch the CNN backbone of a CNN_ViT_LSTM to channels-last (in place)
+        """
+        if self.channels_last:
+            model.cnn.to(memory_format=torch.channels_last)
+            model.cnn.channels_last = True
+        return model
+
+
+def benchmark_policies(model, device, batch_size=8, seq_len=1, image_size=224, steps=5):
+    """
+    Train-step and inference throughput (frames/sec) of every precision policy
+    on random data, logged per policy. Returns {policy name: (train, inference)}.
+    """
+    policies = [
+        PrecisionPolicy(precision, channels_last, device)
+        for precision in ("fp32", "bf16")
+        for channels_last in (False, True)
+    ]
+    if torch.device(device).type == "cuda":
+        policies += [PrecisionPolicy("fp16", channels_last, device) for channels_last in (False, True)]
+
+    x_seq = torch.randn(batch_size, seq_len, 3, image_size, image_size, device=device)
+    labels = torch.randint(0, 2, (batch_size,), device=device)
+    frames = batch_size * seq_len * steps
+    criterion = nn.CrossEntropyLoss()
+    results = {}
+
+    def timed(fn):
+        fn()  # Warm-up
+        if torch.device(device).type == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(steps):
+            fn()
+        if torch.device(device).type == "cuda":
+            torch.cuda.synchronize()
+        return frames / (time.perf_counter() - start)
+
+    for policy in policies:
+        candidate = policy.prepare_model(copy.deepcopy(model).to(device))
+        scaler = policy.grad_scaler()
+
+        def train_step():
+            with policy.autocast():
+                loss = criterion(candidate(x_seq), labels)
+            candidate.zero_grad()
+            scaler.scale(loss).backward()
+
+        def inference_step():
+            with torch.no_grad(), policy.autocast():
+                candidate(x_seq)
+
+        candidate.train()
+        train_rate = timed(train_step)
+        candidate.eval()
+        inference_rate = timed(inference_step)
+        results[str(policy)] = (train_rate, inference_rate)
+        logger.info(f"Policy {policy}: train {train_rate:.1f} frames/sec, inference {inference_rate:.1f} frames/sec")
+        del candidate
+
+    return results
@@ -0,0 +1,99 @@
+import copy
+import logging
+import os
+
+import torch
+import torch.nn as nn
+
+from deepfake.deepfakeai.utils.files import atomic_save
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ["none", "dynamic", "static"]
+
+
+def quantize_dynamic(model):
+    """
+    Dynamic INT8 quantization of every Linear / LSTM layer (ViT blocks, LSTM, head).
+    Weights are stored as int8, activations are quantized on the fly.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear, nn.LSTM}, dtype=torch.qint8)
+
+
+def quantize_static_cnn(model, calibration_batches):
+    """
+    Static INT8 quantization of the CNN backbone (FX graph mode), calibrated on
+    ``calibration_batches`` of normalized frames [N, C, H, W].
+    Returns False (model unchanged) if the backbone cannot be traced.
+    """
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    backbone = model.cnn.model
+    qconfig_mapping = torch.ao.quantization.get_default_qconfig_mapping(torch.backends.quantized.engine)
+    try:
+        prepared = prepare_fx(backbone, qconfig_mapping, example_inputs=(calibration_batches[0],))
+    except Exception as e:
+        logger.warning(f"Static quantization of {model.cnn_backbone} not possible, keeping fp32 convolutions: {e}")
+        return False
+
+    with torch.no_grad():
+        for frames in calibration_batches:
+            prepared(frames)
+    model.cnn.model = convert_fx(prepared)
+    return True
+
+
+def quantize_model(model, mode, calibration_batches=None):
+    """
+    Quantized CPU copy of an fp32 CNN_ViT_LSTM in eval mode.
+
+    - "dynamic": Linear / LSTM layers in dynamic INT8
+    - "static":  additionally the CNN backbone in static INT8 (needs calibration_batches)
+    """
+    if mode not in QUANTIZATION_MODES or mode == "none":
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    qmodel = copy.deepcopy(model).cpu().eval()
+    if mode == "static":
+        if not calibration_batches:
+            raise ValueError("Static quantization needs calibration batches")
+        quantize_static_cnn(qmodel, calibration_batches)
+    return quantize_dynamic(qmodel)
+
+
+def quantized_model_path(model_path, mode):
+    root, _ = os.path.splitext(str(model_path))
+    return f"{root}-{mode}.qpt"
+
+
+def load_quantized_model(model, model_path, mode, calibration_batches=None, calibration_samples=None):
+    """
+    Quantized variant of ``model`` (loaded from ``model_path``), cached next to
+    the checkpoint as ``<model>-<mode>.qpt``. The cache holds the whole module,
+    so it is rebuilt whenever the checkpoint file or a setting frozen into the
+    module changes (micro_batch, ViT token budget, image size and, for "static",
+    ``calibration_samples``). ``calibration_batches`` may be a callable so the
+    calibration data is only loaded on a cache miss.
+    """
+    cache_path = quantized_model_path(model_path, mode)
+    source_mtime = os.stat(str(model_path)).st_mtime_ns
+    settings = {
+        "micro_batch": getattr(model, "micro_batch", None),
+        "vit_token_budget": getattr(model, "vit_token_budget", None),
+        "image_size": getattr(model, "image_size", None),
+        "calibration_samples": calibration_samples if mode == "static" else None
+    }
+
+    if os.path.isfile(cache_path):
+        cached = torch.load(cache_path, map_location="cpu", weights_only=False)
+        if cached.get("source_mtime_ns") == source_mtime and cached.get("settings") == settings:
+            logger.info(f"Loaded {mode} quantized model from {cache_path}")
+            return cached["model"]
+
+    if callable(calibration_batches):
+        calibration_batches = calibration_batches() if mode == "static" else None
+    qmodel = quantize_model(model, mode, calibration_batches)
+
+    atomic_save({"source_mtime_ns": source_mtime, "settings": settings, "model": qmodel}, cache_path)
+    logger.info(f"Cached {mode} quantized model in {cache_path}")
+    return qmodel
@@ -0,0 +1,74 @@
+import torch
+import torch.nn as nn
+import logging
+from .classifier_model import ClassifierHead
+from .cnn_model import CNNExtractor
+
+logger = logging.getLogger(__name__)
+
+
+class StudentModel(nn.Module):
+    """
+    Compact student for CPU serving, distilled from CNN_ViT_LSTM.
+
+    - CNN: MobileNet-class per-frame features
+    - Temporal pooling: mean over the valid steps
+    - Classifier: Final class prediction
+
+    Same interface as CNN_ViT_LSTM (Input [B, Seq, C, H, W], optional lengths,
+    Output [B, num_classes]), so test_model and Predictor use it unchanged.
+    """
+    def __init__(
+        self,
+        cnn_backbone='mobilenetv3_small_100',
+        num_classes=2,
+        micro_batch=None,
+        pretrained=True,
+        weights_dir=None,
+        image_size=224
+    ):
+        super().__init__()
+        self.micro_batch = micro_batch
+        self.cnn_backbone = cnn_backbone
+        self.image_size = image_size
+        self.model_config = {
+            "cnn_backbone": cnn_backbone,
+            "num_classes": num_classes,
+            "image_size": image_size
+        }
+
+        self.cnn = CNNExtractor(cnn_backbone, pretrained=pretrained, weights_dir=weights_dir)
+        cnn_out_dim = self.cnn.model.num_features
+        self.cnn.out_dim = cnn_out_dim
+        self.classifier = ClassifierHead(input_dim=cnn_out_dim, num_classes=num_classes)
+
+        logger.info(f"StudentModel initialized with {cnn_backbone}, CNN output dim: {cnn_out_dim}")
+
+    def checkpoint(self):
+        """
+        Weights plus architecture, loadable with checkpoint.load_model
+        """
+        return {
+            "architecture": "student",
+            "model_config": dict(self.model_config),
+            "state_dict": self.state_dict()
+        }
+
+    def _cnn_features(self, frames):
+        if not self.micro_batch:
+            return self.cnn(frames)
+        return torch.cat([self.cnn(x) for x in frames.split(self.micro_batch)], dim=0)
+
+    def forward(self, x_seq, lengths=None):
+        B, S, C, H, W = x_seq.shape
+        if lengths is None:
+            feats = self._cnn_features(x_seq.reshape(B * S, C, H, W)).view(B, S, -1)
+            return self.classifier(feats.mean(dim=1))
+
+        # Padded steps skip the CNN and are left out of the mean
+        mask = torch.arange(S, device=x_seq.device)[None, :] < lengths.to(x_seq.device)[:, None]
+        valid = self._cnn_features(x_seq[mask])
+        feats = valid.new_zeros(B, S, valid.shape[1])
+        feats[mask] = valid
+        pooled = feats.sum(dim=1) / mask.sum(dim=1, keepdim=True).clamp(min=1).to(feats.dtype)
+        return self.classifier(pooled)
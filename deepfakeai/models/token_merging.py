@@ -0,0 +1,136 @@
+import math
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from timm.models.vision_transformer import Attention, Block
+
+
+def bipartite_soft_matching(metric, r, class_token=True):
+    """
+    Token merging by bipartite soft matching (Bolya et al., "Token Merging:
+    Your ViT But Faster"). Tokens are split alternately into two sets, every
+    token of set A is matched to its most similar token of set B and the
+    ``r`` most similar pairs are merged.
+
+    ``metric`` is [B, N, C] (mean attention keys). Returns a merge function
+    for [B, N, C] tensors that yields [B, N - r, C]. The class token is never merged.
+    """
+    protected = 1 if class_token else 0
+    r = min(r, (metric.shape[1] - protected) // 2)
+    if r <= 0:
+        return lambda x, mode="mean": x
+
+    with torch.no_grad():
+        metric = metric / metric.norm(dim=-1, keepdim=True)
+        a, b = metric[..., ::2, :], metric[..., 1::2, :]
+        scores = a @ b.transpose(-1, -2)
+        if class_token:
+            scores[..., 0, :] = -math.inf
+
+        node_max, node_idx = scores.max(dim=-1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
+        unm_idx = edge_idx[..., r:, :]  # Unmerged tokens of A
+        src_idx = edge_idx[..., :r, :]  # Merged tokens of A
+        dst_idx = node_idx[..., None].gather(dim=-2, index=src_idx)
+        if class_token:
+            # Keep the class token first
+            unm_idx = unm_idx.sort(dim=1)[0]
+
+    def merge(x, mode="mean"):
+        src, dst = x[..., ::2, :], x[..., 1::2, :]
+        n, t1, c = src.shape
+        unm = src.gather(dim=-2, index=unm_idx.expand(n, t1 - r, c))
+        src = src.gather(dim=-2, index=src_idx.expand(n, r, c))
+        dst = dst.scatter_reduce(-2, dst_idx.expand(n, r, c), src, reduce=mode)
+        return torch.cat([unm, dst], dim=1)
+
+    return merge
+
+
+def merge_wavg(merge, x, size):
+    """
+    Size-weighted average merge of tokens ``x``; ``size`` [B, N, 1] counts the
+    patches every token represents
+    """
+    if size is None:
+        size = torch.ones_like(x[..., 0, None])
+    x = merge(x * size, mode="sum")
+    size = merge(size, mode="sum")
+    return x / size, size
+
+
+def merge_schedule(num_tokens, num_blocks, token_budget, protected=1):
+    """
+    Tokens to merge per block so ``num_tokens`` shrink evenly to ``token_budget``
+    after the last block (each block merges at most half of its tokens)
+    """
+    schedule = []
+    remaining = num_tokens
+    for i in range(num_blocks):
+        blocks_left = num_blocks - i
+        r = math.ceil(max(remaining - token_budget, 0) / blocks_left)
+        r = min(r, (remaining - protected) // 2)
+        schedule.append(r)
+        remaining -= r
+    return schedule
+
+
+class ToMeAttention(Attention):
+    """
+    timm Attention that adds proportional attention for merged tokens and
+    also returns the mean keys as the merging metric
+    """
+    def forward(self, x, size=None):
+        B, N, C = x.shape
+        qkv = self.qkv(x).reshape(B, N, 3, self.num_heads, C // self.num_heads).permute(2, 0, 3, 1, 4)
+        q, k, v = qkv.unbind(0)
+        q, k = getattr(self, "q_norm", nn.Identity())(q), getattr(self, "k_norm", nn.Identity())(k)
+
+        # A merged token stands for several patches and gets their attention mass
+        bias = size.log()[:, None, None, :, 0].to(q.dtype) if size is not None else None
+        x = F.scaled_dot_product_attention(
+            q, k, v, attn_mask=bias, dropout_p=self.attn_drop.p if self.training else 0.0
+        )
+        x = x.transpose(1, 2).reshape(B, N, C)
+        x = self.proj_drop(self.proj(x))
+        return x, k.mean(dim=1)
+
+
+class ToMeBlock(Block):
+    """
+    timm transformer Block that merges ``_tome_info["schedule"][index]`` tokens
+    between the attention and the MLP
+    """
+    def forward(self, x):
+        info = self._tome_info
+        x_attn, metric = self.attn(self.norm1(x), info["size"])
+        x = x + self.drop_path1(self.ls1(x_attn))
+
+        r = info["schedule"][self._tome_index]
+        if r > 0:
+            merge = bipartite_soft_matching(metric, r, info["class_token"])
+            x, info["size"] = merge_wavg(merge, x, info["size"])
+
+        return x + self.drop_path2(self.ls2(self.mlp(self.norm2(x))))
+
+
+def apply_token_merging(vit, token_budget):
+    """
+    Patch the blocks of a timm VisionTransformer (in place) to merge patch
+    tokens progressively down to ``token_budget`` tokens. Returns the shared
+    state dict; its "size" must be reset before every forward pass.
+    """
+    num_prefix = getattr(vit, "num_prefix_tokens", 1)
+    num_tokens = vit.patch_embed.num_patches + num_prefix
+    info = {
+        "size": None,
+        "class_token": getattr(vit, "cls_token", None) is not None,
+        "schedule": merge_schedule(num_tokens, len(vit.blocks), token_budget, protected=num_prefix)
+    }
+    for index, block in enumerate(vit.blocks):
+        block.__class__ = ToMeBlock
+        block.attn.__class__ = ToMeAttention
+        block._tome_info = info
+        block._tome_index = index
+    return info
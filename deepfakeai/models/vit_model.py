@@ -1,23 +1,67 @@
 import torch.nn as nn
-import timm
+from timm.layers import resample_abs_pos_embed
+
+from .backbone import create_backbone
+from .token_merging import apply_token_merging
 
 
 class ViTExtractor(nn.Module):
     """
     Vision Transformer Extractor
+
+    ``image_size`` other than the backbone's native size (e.g. 160 or 128 for
+    ``*_224`` models) interpolates the position embeddings to the new patch grid.
+    ``token_budget`` (None = off) merges redundant patch tokens inside the
+    transformer blocks, progressively down to that many tokens (ToMe).
     """
     def __init__(
         self,
         backbone='vit_base_patch16_224', 
-        out_dim=768
+        out_dim=768,
+        pretrained=True,
+        weights_dir=None,
+        token_budget=None,
+        image_size=None
     ):
         super().__init__()
-        self.model = timm.create_model(
+        # pretrained=False skips the ImageNet weights when a checkpoint is loaded afterwards
+        self.model = create_backbone(
             backbone, 
-            pretrained=True, 
+            pretrained=pretrained,
+            weights_dir=weights_dir,
             num_classes=0
         )
         self.out_dim = out_dim
+        if image_size:
+            self.set_image_size(image_size)
+        self._tome_info = None
+        if token_budget:
+            self.set_token_budget(token_budget)
+
+    def set_image_size(self, image_size):
+        """
+        Resize the patch grid to ``image_size`` x ``image_size`` inputs
+        (position embeddings are interpolated, done before loading a checkpoint)
+        """
+        vit, patch_embed = self.model, self.model.patch_embed
+        if tuple(patch_embed.img_size) == (image_size, image_size):
+            return
+        grid = (image_size // patch_embed.patch_size[0], image_size // patch_embed.patch_size[1])
+        num_prefix = 0 if getattr(vit, "no_embed_class", False) else vit.num_prefix_tokens
+        vit.pos_embed = nn.Parameter(
+            resample_abs_pos_embed(vit.pos_embed.data, new_size=grid, num_prefix_tokens=num_prefix)
+        )
+        patch_embed.img_size = (image_size, image_size)
+        patch_embed.grid_size = grid
+        patch_embed.num_patches = grid[0] * grid[1]
+
+    def set_token_budget(self, token_budget):
+        """
+        Enable token merging down to ``token_budget`` tokens (weights are unchanged)
+        """
+        self._tome_info = apply_token_merging(self.model, token_budget)
 
     def forward(self, x):
+        if self._tome_info is not None:
+            self._tome_info["size"] = None
         return self.model(x)  # [B, out_dim]
@@ -1,10 +1,21 @@
 import torch
 import torch.nn.functional as F
-from torchvision import transforms
 from PIL import Image
 import cv2
+import logging
 import os
-from deepfake.deepfakeai.models.base_model import CNN_ViT_LSTM
+import time
+from collections import deque
+
+import numpy as np
+from deepfake.deepfakeai.models.checkpoint import load_configured_model
+from deepfake.deepfakeai.models.precision import PrecisionPolicy
+from deepfake.deepfakeai.models.onnx_backend import OnnxModel, check_onnx_parity, onnx_model_path
+from deepfake.deepfakeai.models.quantize import load_quantized_model
+from deepfake.deepfakeai.utils import sample_frame_batches
+from deepfake.deepfakeai.utils.preprocess import images_to_batch
+
+logger = logging.getLogger(__name__)
 
 class Predictor:
     def __init__(self, config: dict):
@@ -21,18 +32,67 @@ class Predictor:
                 f" Please train or download the model first."
             )
         
-        self.model = CNN_ViT_LSTM().to(self.device)
-        self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-        self.model.eval()
-        
-        # Preprocessing
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),                 # Standardize input size
-            transforms.RandomHorizontalFlip(p=0.5),        # Helps generalization
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                std=[0.229, 0.224, 0.225]),
-        ])
+        # Built straight from the checkpoint (CNN_ViT_LSTM or distilled student),
+        # no pretrained backbone download
+        models_config = config.get("models", {})
+        # Inference backend: "torch" (eager PyTorch) or "onnx" (ONNX Runtime, CPU)
+        self.backend = models_config.get("backend", "torch")
+        overrides = {}
+        if self.backend == "onnx" and models_config.get("vit_token_budget"):
+            # The exported graph runs the full token sequence, the parity check must too
+            logger.warning("models.vit_token_budget is ignored by the onnx backend")
+            overrides["vit_token_budget"] = None
+        self.model = load_configured_model(config, model_path, self.device, **overrides)
+
+        # Preprocessing (inference variant: resize + normalize, no random flip)
+        # at the input resolution stored with the model
+        self.image_size = self.model.image_size
+
+        # Autocast / channels-last policy of the PyTorch backend (fp32 for ONNX and INT8)
+        self.policy = PrecisionPolicy(device=self.device)
+
+        if self.backend == "onnx":
+            onnx_path = onnx_model_path(model_path)
+            if not os.path.exists(onnx_path):
+                raise FileNotFoundError(
+                    f"ONNX model {os.path.basename(onnx_path)} not found in {models_dir},"
+                    f" run 'deepfake export' first."
+                )
+            if os.path.getmtime(onnx_path) < os.path.getmtime(model_path):
+                logger.warning(f"{onnx_path} is older than {model_path}, run 'deepfake export' again")
+            onnx_model = OnnxModel(onnx_path, num_threads=models_config.get("onnx_threads"))
+            if models_config.get("onnx_parity_check", True):
+                check_onnx_parity(onnx_model, self.model, image_size=self.image_size)
+            self.device = "cpu"
+            self.model = onnx_model
+        elif self.backend != "torch":
+            raise ValueError(f"Unknown inference backend: {self.backend}")
+
+        # Optional INT8 variant ("dynamic" or "static"), cached next to the checkpoint
+        self.quantization = models_config.get("quantization", "none")
+        if self.quantization != "none" and self.backend == "torch":
+            # Quantized kernels run on the CPU only
+            self.device = "cpu"
+            calibration_samples = models_config.get("calibration_samples", 256)
+            self.model = load_quantized_model(
+                self.model, model_path, self.quantization,
+                calibration_batches=lambda: sample_frame_batches(
+                    str(config["imgdir"] / "test"), calibration_samples, size=self.image_size
+                ),
+                calibration_samples=calibration_samples
+            )
+        elif self.backend == "torch":
+            self.policy = PrecisionPolicy.from_config(config, self.device)
+            self.model = self.policy.prepare_model(self.model)
+
+        # Early-exit cascade: the aux head answers alone outside the uncertainty band
+        self.cascade = models_config.get("cascade", False)
+        self.cascade_band = tuple(models_config.get("cascade_band", [0.1, 0.9]))
+        if self.cascade and (self.backend != "torch" or getattr(self.model, "aux_classifier", None) is None):
+            logger.warning("Cascade inference needs the torch backend and a model trained with models.aux_head, disabled")
+            self.cascade = False
+        # (path, latency ms) of recent requests, see path_stats
+        self.history = deque(maxlen=models_config.get("path_history", 1000))
 
 
     def predict_image(self, image_path):
@@ -40,21 +100,8 @@ class Predictor:
         Predict single image (Real / Fake) and return detection scores
         """
         img = Image.open(image_path).convert("RGB")
-        img = self.transform(img).unsqueeze(0).unsqueeze(1).to(self.device)  # [B, Seq, C, H, W]
-
-        with torch.no_grad():
-            output = self.model(img)
-            probs = F.softmax(output, dim=1)[0]  # shape: [2]
-            pred = torch.argmax(probs).item()
-    
-        return {
-            "label": "Real" if pred == 0 else "Fake",
-            "confidence": probs[pred].item(),
-            "scores": {
-                "real": probs[0].item(),
-                "fake": probs[1].item()
-            }
-        }
+        img = images_to_batch([img], self.image_size).unsqueeze(1).to(self.device)  # [B, Seq, C, H, W]
+        return self._classify(img)
 
 
     def predict_video(self, video_path, frame_skip=10, max_frames=20):
@@ -69,21 +116,34 @@ class Predictor:
             if not ret:
                 break
             if count % frame_skip == 0:
-                img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                img = self.transform(img).unsqueeze(0).to(self.device)
-                frames.append(img)
+                frames.append(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
             count += 1
         cap.release()
 
         if not frames:
             return {"label": "Error", "confidence": 0.0, "scores": {"real": 0.0, "fake": 0.0}}
 
-        frames = torch.cat(frames, dim=0).unsqueeze(0)  # [1, Seq, C, H, W]
+        frames = images_to_batch(frames, self.image_size).unsqueeze(0).to(self.device)  # [1, Seq, C, H, W]
+        return self._classify(frames)
+
 
-        with torch.no_grad():
-            output = self.model(frames)
-            probs = F.softmax(output, dim=1)[0]  # shape: [2]
+    def _classify(self, frames):
+        """
+        Run the model on one [1, Seq, C, H, W] sample and build the result.
+        "path" records whether the cascade exited early ("early_exit") or ran
+        the full model ("full"), "latency_ms" the model time.
+        """
+        start = time.perf_counter()
+        with torch.no_grad(), self.policy.autocast():
+            if self.cascade:
+                output, exited = self.model.forward_cascade(frames, self.cascade_band)
+                path = "early_exit" if exited[0] else "full"
+            else:
+                output, path = self.model(frames), "full"
+            probs = F.softmax(output.float(), dim=1)[0]  # shape: [2]
             pred = torch.argmax(probs).item()
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.history.append((path, latency_ms))
 
         return {
             "label": "Real" if pred == 0 else "Fake",
@@ -91,6 +151,24 @@ class Predictor:
             "scores": {
                 "real": probs[0].item(),
                 "fake": probs[1].item()
-            }
+            },
+            "path": path,
+            "latency_ms": latency_ms
         }
+
+
+    def path_stats(self):
+        """
+        Early-exit fraction and latency percentiles (ms) per path over the recent requests
+        """
+        stats = {"requests": len(self.history)}
+        if not self.history:
+            return stats
+        stats["early_exit_fraction"] = sum(path == "early_exit" for path, _ in self.history) / len(self.history)
+        for path in ("early_exit", "full"):
+            latencies = [ms for p, ms in self.history if p == path]
+            if latencies:
+                p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+                stats[path] = {"count": len(latencies), "p50_ms": p50, "p90_ms": p90, "p99_ms": p99}
+        return stats
     
\ No newline at end of file
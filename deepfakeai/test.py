@@ -1,10 +1,12 @@
+import json
 import logging
 import os
+import time
 
 import torch
-from torchvision import transforms
-from torch.utils.data import DataLoader
 from sklearn.metrics import (
+    accuracy_score,
+    roc_auc_score,
     classification_report, 
     confusion_matrix, 
     ConfusionMatrixDisplay
@@ -13,8 +15,24 @@ import matplotlib.pyplot as plt  # <-- Add matplotlib import3
 import seaborn as sns
 import numpy as np
 
-from deepfake.deepfakeai.utils import DeepfakeDataset
-from deepfake.deepfakeai.models.base_model import CNN_ViT_LSTM
+from deepfake.exceptions import ConfigurationError
+from deepfake.deepfakeai.utils import (
+    build_dataset,
+    create_data_loader,
+    dataset_cache_dir,
+    sample_frame_batches
+)
+from deepfake.deepfakeai.utils.preprocess import (
+    BatchCollate,
+    SequenceCollate,
+    ToUint8Tensor,
+    split_batch
+)
+from deepfake.deepfakeai.models.base_model import check_forward_parity
+from deepfake.deepfakeai.models.checkpoint import load_configured_model
+from deepfake.deepfakeai.models.precision import PrecisionPolicy
+from deepfake.deepfakeai.models.quantize import load_quantized_model
+from deepfake.deepfakeai.distill import student_model_name
 
 logger = logging.getLogger(__name__)
 
@@ -22,20 +40,158 @@ logger = logging.getLogger(__name__)
 # Device configuration
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Transformations
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),                 # Standardize input size
-    transforms.RandomHorizontalFlip(p=0.5),        # Helps generalization
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225]),
-])
+def evaluate(model, loader, device, max_batches=None, policy=None):
+    """
+    Run ``model`` over ``loader`` (under the autocast of ``policy``, default fp32)
+    and return (y_true, y_pred, y_probs, ms per sample)
+    """
+    policy = policy or PrecisionPolicy(device=device)
+    y_true, y_pred, y_probs = [], [], []
+    elapsed, samples = 0.0, 0
+
+    with torch.no_grad(), policy.autocast():
+        for i, batch in enumerate(loader):
+            if max_batches is not None and i >= max_batches:
+                break
+            imgs, labels, lengths = split_batch(batch)
+            imgs, labels = imgs.to(device), labels.to(device)
+            start = time.perf_counter()
+            outputs = model(imgs, lengths).float()
+            elapsed += time.perf_counter() - start
+            samples += len(labels)
+            preds = torch.argmax(outputs, dim=1)
+            y_true.extend(labels.cpu().numpy())
+            y_pred.extend(preds.cpu().numpy())
+            y_probs.extend(torch.softmax(outputs, dim=1)[:, 1].cpu().numpy())  # Prob for class "Fake"
+
+    return y_true, y_pred, y_probs, elapsed * 1000 / max(samples, 1)
+
+
+def quantization_report(config, model, model_path, test_loader, fp32_results, result_dir):
+    """
+    Accuracy delta and CPU latency of the quantized model (models.quantization)
+    against the fp32 model, written to results/quantization_report.json
+    """
+    models_config = config.get("models", {})
+    mode = models_config.get("quantization", "none")
+    calibration_samples = models_config.get("calibration_samples", 256)
+    qmodel = load_quantized_model(
+        model, model_path, mode,
+        calibration_batches=lambda: sample_frame_batches(
+            str(config["imgdir"] / "test"), calibration_samples, size=model.image_size
+        ),
+        calibration_samples=calibration_samples
+    )
+
+    y_true, y_pred, y_probs, _ = fp32_results
+    q_true, q_pred, q_probs, _ = evaluate(qmodel, test_loader, "cpu")
+
+    # Latency of both variants on the same CPU batches
+    latency_batches = models_config.get("latency_batches", 10)
+    fp32_ms = evaluate(model.to("cpu"), test_loader, "cpu", max_batches=latency_batches)[3]
+    quant_ms = evaluate(qmodel, test_loader, "cpu", max_batches=latency_batches)[3]
+    model.to(device)
+
+    report = {
+        "mode": mode,
+        # Accuracy of the "fp32" model is measured under the configured precision policy
+        "baseline_policy": str(PrecisionPolicy.from_config(config, device)),
+        "fp32": {
+            "accuracy": accuracy_score(y_true, y_pred),
+            "auc": roc_auc_score(y_true, y_probs),
+            "cpu_ms_per_sample": fp32_ms
+        },
+        "quantized": {
+            "accuracy": accuracy_score(q_true, q_pred),
+            "auc": roc_auc_score(q_true, q_probs),
+            "cpu_ms_per_sample": quant_ms
+        }
+    }
+    report["accuracy_delta"] = report["quantized"]["accuracy"] - report["fp32"]["accuracy"]
+    report["auc_delta"] = report["quantized"]["auc"] - report["fp32"]["auc"]
+    report["speedup"] = fp32_ms / quant_ms if quant_ms else None
+
+    with open(os.path.join(result_dir, "quantization_report.json"), "w") as f:
+        json.dump(report, f, indent=4)
+    logger.info(
+        f"Quantization ({mode}): accuracy {report['accuracy_delta']:+.4f}, AUC {report['auc_delta']:+.4f}, "
+        f"CPU latency {fp32_ms:.1f} -> {quant_ms:.1f} ms/sample"
+    )
+    return report
+
+
+def model_comparison_report(config, results, test_loader, result_dir, image_size=224):
+    """
+    Accuracy and latency of the tested model against the models in
+    test.compare_models (default: the distilled student, if trained),
+    written to results/model_comparison.json. Models trained for another
+    ``image_size`` than the test loader are skipped.
+    """
+    models_dir = config["modelsdir"]
+    compare_models = config.get("test", {}).get("compare_models")
+    if compare_models is None:
+        compare_models = [student_model_name(config)]
+
+    def summary(model_results):
+        y_true, y_pred, y_probs, ms_per_sample = model_results
+        return {
+            "accuracy": accuracy_score(y_true, y_pred),
+            "auc": roc_auc_score(y_true, y_probs),
+            "ms_per_sample": ms_per_sample
+        }
+
+    policy = PrecisionPolicy.from_config(config, device)
+    report = {config["model_name"]: summary(results)}
+    for name in compare_models:
+        path = os.path.join(str(models_dir), f"{name}.pth")
+        if name in report or not os.path.exists(path):
+            continue
+        try:
+            other = load_configured_model(config, path, device, image_size=image_size)
+        except ConfigurationError as e:
+            logger.warning(f"Skipping {name} in the model comparison: {e}")
+            continue
+        other = policy.prepare_model(other)
+        report[name] = summary(evaluate(other, test_loader, device, policy=policy))
+        logger.info(
+            f"{name}: accuracy {report[name]['accuracy']:.4f}, AUC {report[name]['auc']:.4f}, "
+            f"{report[name]['ms_per_sample']:.1f} ms/sample"
+        )
+
+    if len(report) == 1:
+        return None
+    with open(os.path.join(result_dir, "model_comparison.json"), "w") as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+def build_test_loader(config, image_size=224):
+    """
+    DataLoader over imgdir/test with the dataloader config (no flip),
+    resized to ``image_size``
+    """
+    # Transformations (inference variant: no flip, normalized on the batch)
+    transform = ToUint8Tensor(image_size)
+    dataloader_config = config.get("dataloader", {})
+    seq_len = dataloader_config.get("sequence_length", 1)
+    test_dataset = build_dataset(
+        root_dir=str(config["imgdir"] / "test"), 
+        transform=transform,
+        data_format=dataloader_config.get("format", "files"),
+        cache_dir=dataset_cache_dir(config),
+        seq_len=seq_len,
+        seq_stride=dataloader_config.get("sequence_stride"),
+        decode_backend=dataloader_config.get("decode_backend", "pil"),
+        image_size=image_size
+    )
+    collate_fn = SequenceCollate() if seq_len > 1 else BatchCollate()
+    return create_data_loader(test_dataset, config, collate_fn=collate_fn)
+
 
 def test_model(config: dict[str, dict]):
     """
     Main function to test the model
     """
-    image_dataset = config["imgdir"] / "test"
     models_dir = config["modelsdir"]
     result_dir = str(config["user_data_dir"] / "results")
 
@@ -44,30 +200,24 @@ def test_model(config: dict[str, dict]):
     model_name = f"{config['model_name']}.pth"
     model_path = os.path.join(str(models_dir), model_name)
 
-    # Load test dataset
-    test_dataset = DeepfakeDataset(
-        root_dir=str(image_dataset), 
-        transform=transform
-    )
-    test_loader = DataLoader(test_dataset, batch_size=16, shuffle=False)
 
     # Load model
-    model = CNN_ViT_LSTM().to(device)
-    model.load_state_dict(torch.load(model_path))
-    model.eval()
+    # Built straight from the checkpoint, no pretrained backbone download
+    model = load_configured_model(config, model_path, device)
+    if hasattr(model, "forward_loop"):
+        # Vectorized / micro-batched forward against the per-timestep reference loop
+        check_forward_parity(model)
 
-    # Evaluate model
-    y_true, y_pred, y_probs = [], [], []
+    # Load test dataset at the resolution of the model
+    test_loader = build_test_loader(config, model.image_size)
 
-    with torch.no_grad():
-        for imgs, labels in test_loader:
-            imgs, labels = imgs.to(device), labels.to(device)
-            imgs = imgs.unsqueeze(1)
-            outputs = model(imgs)
-            preds = torch.argmax(outputs, dim=1)
-            y_true.extend(labels.cpu().numpy())
-            y_pred.extend(preds.cpu().numpy())
-            y_probs.extend(torch.softmax(outputs, dim=1)[:, 1].cpu().numpy())  # Prob for class "Fake"
+    # Same precision / memory-format policy as training and prediction
+    policy = PrecisionPolicy.from_config(config, device)
+    model = policy.prepare_model(model)
+
+    # Evaluate model
+    fp32_results = evaluate(model, test_loader, device, policy=policy)
+    y_true, y_pred, y_probs, _ = fp32_results
 
     # Classification report
     report = classification_report(y_true, y_pred, target_names=["Real", "Fake"], output_dict=True)
@@ -131,3 +281,10 @@ def test_model(config: dict[str, dict]):
     plt.tight_layout()
     plt.savefig(os.path.join(result_dir, "roc_curve.png"))
     plt.close()
+
+    # 5. Quantized variant: accuracy delta and latency comparison
+    if config.get("models", {}).get("quantization", "none") != "none":
+        quantization_report(config, model, model_path, test_loader, fp32_results, result_dir)
+
+    # 6. Other models, e.g. teacher vs. distilled student: accuracy and latency
+    model_comparison_report(config, fp32_results, test_loader, result_dir, model.image_size)
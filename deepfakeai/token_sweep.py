@@ -0,0 +1,73 @@
+"""
+Speed vs. AUC sweep over ViT token merging budgets.
+
+Evaluates the ``model_name`` checkpoint on imgdir/test once per budget in
+``test.token_budgets`` (null = no merging) and writes
+results/token_sweep.json and results/token_sweep.png.
+
+Run with: python -m deepfake.deepfakeai.token_sweep
+"""
+import json
+import logging
+import os
+
+import matplotlib.pyplot as plt
+from sklearn.metrics import roc_auc_score
+
+from deepfake.deepfakeai.models.checkpoint import load_configured_model
+from deepfake.deepfakeai.models.precision import PrecisionPolicy
+from deepfake.deepfakeai.test import build_test_loader, device, evaluate
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUDGETS = [None, 160, 128, 96, 64]
+
+
+def token_budget_sweep(config: dict[str, dict]):
+    """
+    Return [{"token_budget", "auc", "ms_per_sample"}] for every budget
+    """
+    model_path = os.path.join(str(config["modelsdir"]), f"{config['model_name']}.pth")
+    result_dir = str(config["user_data_dir"] / "results")
+    os.makedirs(result_dir, exist_ok=True)
+
+    # Token budgets do not change the input resolution stored with the model
+    test_loader = None
+    policy = PrecisionPolicy.from_config(config, device)
+
+    results = []
+    for budget in config.get("test", {}).get("token_budgets", TOKEN_BUDGETS):
+        model = load_configured_model(config, model_path, device, vit_token_budget=budget)
+        model = policy.prepare_model(model)
+        if test_loader is None:
+            test_loader = build_test_loader(config, model.image_size)
+
+        y_true, _, y_probs, ms_per_sample = evaluate(model, test_loader, device, policy=policy)
+        results.append({
+            "token_budget": budget,
+            "auc": roc_auc_score(y_true, y_probs),
+            "ms_per_sample": ms_per_sample
+        })
+        logger.info(f"Token budget {budget or 'full'}: AUC {results[-1]['auc']:.4f}, {ms_per_sample:.1f} ms/sample")
+
+    with open(os.path.join(result_dir, "token_sweep.json"), "w") as f:
+        json.dump(results, f, indent=4)
+
+    plt.figure(figsize=(6, 5))
+    plt.plot([r["ms_per_sample"] for r in results], [r["auc"] for r in results], "o-")
+    for r in results:
+        plt.annotate(str(r["token_budget"] or "full"), (r["ms_per_sample"], r["auc"]))
+    plt.xlabel("Latency (ms / sample)")
+    plt.ylabel("AUC")
+    plt.title("ViT Token Merging: Speed vs. AUC")
+    plt.grid(True, linestyle="--", alpha=0.5)
+    plt.tight_layout()
+    plt.savefig(os.path.join(result_dir, "token_sweep.png"))
+    plt.close()
+    return results
+
+
+if __name__ == "__main__":
+    from deepfake.configuration import Configuration
+
+    token_budget_sweep(Configuration().get_config())
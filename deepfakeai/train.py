@@ -1,32 +1,52 @@
 import logging
 import os
+import random
 from tqdm import tqdm
 
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
-from torchvision import transforms
+from torch.utils.data import IterableDataset
 
-from deepfake.deepfakeai.utils import DeepfakeDataset
+from deepfake.exceptions import ConfigurationError
+from deepfake.deepfakeai.utils import (
+    ResumableRandomSampler,
+    benchmark_decoders,
+    build_dataset,
+    create_data_loader,
+    dataset_cache_dir
+)
+from deepfake.deepfakeai.utils.features import FeatureCollate, build_feature_dataset
+from deepfake.deepfakeai.utils.files import atomic_save
+from deepfake.deepfakeai.utils.training_state import (
+    latest_training_state,
+    rng_state,
+    save_training_state,
+    set_rng_state,
+    training_checkpoint_dir,
+    training_state_paths
+)
+from deepfake.deepfakeai.utils.preprocess import (
+    BatchCollate,
+    SequenceCollate,
+    ToUint8Tensor,
+    split_batch
+)
+from deepfake.deepfakeai.models.backbone import pretrained_weights_dir
 from deepfake.deepfakeai.models.base_model import CNN_ViT_LSTM
+from deepfake.deepfakeai.models.precision import PrecisionPolicy, benchmark_policies
 
 logger = logging.getLogger(__name__)
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Enhanced image transforms (same, but can reduce size if needed)
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),                 # Standardize input size
-    transforms.RandomHorizontalFlip(p=0.5),        # Helps generalization
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225]),
-])
-
-def train_model(config: dict[str, dict]):
+def train_model(config: dict[str, dict], resume=False):
     """
-    Main function for training the Model
+    Main function for training the Model.
+
+    Model, optimizer, epoch, step and RNG state are checkpointed after every
+    epoch (and every train.checkpoint_every steps); ``resume`` continues from
+    the latest checkpoint instead of starting over.
     """
     image_dataset = config["imgdir"] / "train"
     models_dir = config["modelsdir"]
@@ -37,47 +57,183 @@ def train_model(config: dict[str, dict]):
     cnn_backbone = config.get("models", {}).get("cnn_backbone")  
     vit_backbone = config.get("models", {}).get("vit_backbone")
 
-    # Set batch size to 1 or 2 due to 4GB GPU
-    train_dataset = DeepfakeDataset(
+    dataloader_config = config.get("dataloader", {})
+    train_config = config.get("train", {})
+
+    # Input resolution, stored with the model (ViT position embeddings are interpolated)
+    image_size = config.get("models", {}).get("image_size") or 224
+    # Per-sample work is only the resize to uint8, flip + normalize run on the batch
+    transform = ToUint8Tensor(image_size)
+
+    # Frames per training sample, > 1 trains the LSTM on real per-video sequences
+    seq_len = dataloader_config.get("sequence_length", 1)
+
+    if dataloader_config.get("decode_benchmark", False):
+        benchmark_decoders(str(image_dataset))
+
+    train_dataset = build_dataset(
         root_dir=str(image_dataset),
-        transform=transform
-    )
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=16,  # Reduced batch size
+        transform=transform,
+        data_format=dataloader_config.get("format", "files"),
         shuffle=True,
-        pin_memory=True,
-        num_workers=2
+        cache_dir=dataset_cache_dir(config),
+        seq_len=seq_len,
+        seq_stride=dataloader_config.get("sequence_stride"),
+        decode_backend=dataloader_config.get("decode_backend", "pil"),
+        image_size=image_size
     )
 
     model = CNN_ViT_LSTM(
         cnn_backbone=cnn_backbone,
         vit_backbone=vit_backbone,
         hidden_dim=256,
-        num_classes=2
+        num_classes=2,
+        micro_batch=config.get("models", {}).get("micro_batch"),
+        # ImageNet weights are read from (or downloaded once into) modelsdir/pretrained
+        weights_dir=pretrained_weights_dir(config),
+        # Early-exit head on the CNN features, see CNN_ViT_LSTM.forward_cascade
+        aux_head=config.get("models", {}).get("aux_head", False),
+        # ViT token merging down to this many tokens (None = full 197 tokens)
+        vit_token_budget=config.get("models", {}).get("vit_token_budget"),
+        image_size=image_size
     ).to(device)
 
+    # bf16 / fp16 autocast and channels-last CNN (models.precision, models.channels_last)
+    policy = PrecisionPolicy.from_config(config, device)
+    if config.get("models", {}).get("precision_benchmark", False):
+        benchmark_policies(
+            model, device, batch_size=dataloader_config.get("batch_size", 16), seq_len=seq_len, image_size=image_size
+        )
+    model = policy.prepare_model(model)
+    logger.info(f"Training with precision policy {policy}")
+
+    feature_cache = train_config.get("feature_cache", False)
+    if feature_cache:
+        # Frozen backbones: CNN + ViT features are computed once and cached,
+        # only the LSTM and the classifier head are trained
+        train_dataset = build_feature_dataset(model, train_dataset, config, device, policy)
+        collate_fn = FeatureCollate()
+        params = list(model.temporal.parameters()) + list(model.classifier.parameters())
+        if model.aux_classifier is not None:
+            params += list(model.aux_classifier.parameters())
+    else:
+        collate_fn = SequenceCollate(train=True) if seq_len > 1 else BatchCollate(train=True)
+        params = model.parameters()
+
+    # Per-epoch permutation that a resumed epoch starts part-way through (shards shuffle themselves)
+    sampler = None
+    if not isinstance(train_dataset, IterableDataset):
+        sampler = ResumableRandomSampler(train_dataset, seed=random.randrange(2 ** 31))
+
+    # Batch size, workers, prefetch and pinning come from the dataloader config
+    # (num_workers "auto" probes the fastest setting for this host)
+    train_loader = create_data_loader(train_dataset, config, collate_fn=collate_fn, shuffle=True, sampler=sampler)
+
     criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=1e-4)
+    aux_weight = train_config.get("aux_loss_weight", 0.5)
+    epochs = train_config.get("epochs", 5)
+    optimizer = optim.Adam(params, lr=train_config.get("lr", 1e-4))
+    # Loss scaling for fp16, a pass-through for fp32 / bf16
+    scaler = policy.grad_scaler()
+
+    # Resumable training state, the newest train.keep_checkpoints are kept
+    checkpoint_dir = training_checkpoint_dir(config)
+    checkpoint_every = train_config.get("checkpoint_every")
+    keep_checkpoints = train_config.get("keep_checkpoints", 3)
+    batch_size = dataloader_config.get("batch_size", 16)
+    start_epoch, start_batch, step = 0, 0, 0
+    stale_states = []
+    # A checkpoint only resumes with the same architecture, trained parameters
+    # (optimizer param groups) and loss scaler
+    resume_settings = {
+        "model_config": model.model_config,
+        "feature_cache": feature_cache,
+        "precision": policy.precision
+    }
 
-    for epoch in range(5):
+    state = latest_training_state(checkpoint_dir) if resume else None
+    if state is not None:
+        changed = [key for key, value in resume_settings.items() if state["settings"].get(key) != value]
+        if changed:
+            raise ConfigurationError(
+                f"Training checkpoint in {checkpoint_dir} was made with different settings: "
+                + ", ".join(f"{key} {state['settings'].get(key)} (now {resume_settings[key]})" for key in changed)
+                + ". Train without --resume to start over."
+            )
+        if state["batch_size"] != batch_size:
+            logger.warning(f"Resuming with batch size {batch_size}, the checkpoint was trained with {state['batch_size']}")
+        model.load_state_dict(state["model"]["state_dict"])
+        optimizer.load_state_dict(state["optimizer"])
+        scaler.load_state_dict(state["scaler"])
+        start_epoch, step = state["epoch"], state["step"]
+        # Position in the interrupted epoch, in batches of the current batch size
+        start_batch = state["batch"] * state["batch_size"] // batch_size
+        if sampler is not None:
+            sampler.seed = state["sampler_seed"]
+        set_rng_state(state["rng_state"])
+        logger.info(f"Resumed at epoch {start_epoch + 1}, batch {start_batch}, step {step}")
+    else:
+        if resume:
+            logger.info(f"No training checkpoint found in {checkpoint_dir}, starting from scratch")
+        # Checkpoints of a previous run are only removed once this run has saved its own
+        stale_states = training_state_paths(checkpoint_dir)
+        if stale_states:
+            logger.warning(
+                f"{len(stale_states)} training checkpoints of a previous run in {checkpoint_dir} will be replaced"
+                f" at the first checkpoint of this run, stop and use --resume to continue that run instead"
+            )
+
+    def save_state(epoch, batch):
+        save_training_state(checkpoint_dir, {
+            "model": model.checkpoint(),
+            "optimizer": optimizer.state_dict(),
+            "scaler": scaler.state_dict(),
+            "epoch": epoch,
+            "batch": batch,
+            "step": step,
+            "batch_size": batch_size,
+            "settings": resume_settings,
+            "sampler_seed": sampler.seed if sampler is not None else None,
+            "rng_state": rng_state()
+        }, keep=keep_checkpoints, replace=stale_states)
+        stale_states.clear()
+
+    for epoch in range(start_epoch, epochs):
+        # Batches finished before an interruption are skipped by index, never loaded
+        skip = start_batch if epoch == start_epoch else 0
+        if sampler is not None:
+            sampler.set_epoch(epoch, start=skip * batch_size)
+        if hasattr(train_dataset, "set_epoch"):
+            train_dataset.set_epoch(epoch, skip_batches=skip, batch_size=batch_size)
+        # The sampler shortens the loader by the skipped batches, shards do not
+        total = len(train_loader) + (skip if sampler is not None else 0)
         model.train()
-        total_loss = 0
-        for imgs, labels in tqdm(train_loader):
+        total_loss, num_batches = 0, 0
+        for i, batch in enumerate(tqdm(train_loader, initial=skip, total=total), start=skip):
+            # [B, Seq, C, H, W] (or [B, Seq, D] features); single frames come as sequences of length 1
+            imgs, labels, lengths = split_batch(batch)
             imgs, labels = imgs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
 
-            # Check if unsqueeze(1) is required — if model expects 5D input
-            # If not needed, remove or comment out
-            imgs = imgs.unsqueeze(1)  # [B, 1, C, H, W] for temporal modeling (keep if model requires)
-
-            outputs = model(imgs)
-            loss = criterion(outputs, labels)
+            with policy.autocast():
+                # Per-frame features [B, Seq, combined_dim], cached or from the backbones
+                features = imgs if feature_cache else model.extract_features(imgs, lengths)
+                outputs = model.forward_features(features, lengths)
+                loss = criterion(outputs, labels)
+                if model.aux_classifier is not None:
+                    # Early-exit head, trained jointly on the same CNN features
+                    loss = loss + aux_weight * criterion(model.aux_logits(features, lengths), labels)
             optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
             total_loss += loss.item()
+            num_batches += 1
+            step += 1
+            if checkpoint_every and step % checkpoint_every == 0:
+                save_state(epoch, i + 1)
 
-        logger.info(f"Epoch {epoch+1}, Loss: {total_loss / len(train_loader):.4f}")
+        logger.info(f"Epoch {epoch+1}, Loss: {total_loss / max(num_batches, 1):.4f}")
+        save_state(epoch + 1, 0)
 
-    # Save model weights
-    torch.save(model.state_dict(), model_path)
+    # Save model weights together with the architecture
+    atomic_save(model.checkpoint(), model_path)
@@ -1 +1,15 @@
-from deepfake.deepfakeai.utils.dataloader import DeepfakeDataset
\ No newline at end of file
+from deepfake.deepfakeai.utils.dataloader import (
+    DeepfakeDataset,
+    ShardedDeepfakeDataset,
+    VideoSequenceDataset,
+    ResumableRandomSampler,
+    ImageDecoder,
+    benchmark_decoders,
+    sample_frame_batches,
+    probe_loader_throughput,
+    build_dataset,
+    create_data_loader,
+    dataset_cache_dir
+)
+from deepfake.deepfakeai.utils.landmarks import LandmarkStore
+from deepfake.deepfakeai.utils.index import DatasetIndex
\ No newline at end of file
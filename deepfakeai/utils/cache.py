@@ -0,0 +1,93 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TensorCache:
+    """
+    On-disk cache of fixed-shape rows (e.g. pre-resized uint8 CHW images or
+    backbone features) for the samples of one split.
+
+    Three files live in ``cache_dir``:
+
+    - ``{name}.npy``:       [N, *row_shape] rows of ``dtype`` (sparse until filled)
+    - ``{name}-mtime.npy``: int64 [N] source file mtime per row, 0 = empty
+    - ``{name}-paths.npy``: source path of every row
+
+    A row is only served while the source file's mtime matches the stored one.
+    The arrays are opened lazily in every process, so DataLoader workers write
+    their own (disjoint) rows into the same files.
+    """
+    def __init__(self, cache_dir, name, paths, row_shape, dtype=np.uint8):
+        os.makedirs(str(cache_dir), exist_ok=True)
+        base = os.path.join(str(cache_dir), name)
+        self.pixels_path = f"{base}.npy"
+        self.mtime_path = f"{base}-mtime.npy"
+        self.paths_path = f"{base}-paths.npy"
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self._pixels = None
+        self._mtimes = None
+
+        paths = np.asarray(paths, dtype=str)
+        if not self._matches(paths):
+            logger.info(f"Creating tensor cache {self.pixels_path} for {len(paths)} rows")
+            shape = (len(paths), *self.row_shape)
+            np.lib.format.open_memmap(self.pixels_path, mode="w+", dtype=self.dtype, shape=shape).flush()
+            np.save(self.mtime_path, np.zeros(len(paths), dtype=np.int64))
+            np.save(self.paths_path, paths)
+
+    def _matches(self, paths):
+        if not all(os.path.isfile(p) for p in (self.pixels_path, self.mtime_path, self.paths_path)):
+            return False
+        cached_paths = np.load(self.paths_path)
+        if cached_paths.shape != paths.shape or not (cached_paths == paths).all():
+            return False
+        pixels = np.load(self.pixels_path, mmap_mode="r")
+        return pixels.shape[1:] == self.row_shape and pixels.dtype == self.dtype
+
+    def _open(self):
+        if self._pixels is None:
+            self._pixels = np.load(self.pixels_path, mmap_mode="r+")
+            self._mtimes = np.load(self.mtime_path, mmap_mode="r+")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pixels"] = None
+        state["_mtimes"] = None
+        return state
+
+    def get(self, row, mtime_ns):
+        """
+        Cached array of ``row``, or None if missing / stale
+        """
+        self._open()
+        if self._mtimes[row] != mtime_ns:
+            return None
+        return np.array(self._pixels[row])
+
+    def missing_rows(self, paths):
+        """
+        Rows whose cached value is missing or older than the source file
+        """
+        self._open()
+        return [
+            row for row, path in enumerate(paths)
+            if self._mtimes[row] != os.stat(path).st_mtime_ns
+        ]
+
+    def row(self, row):
+        """
+        Cached array of ``row`` without freshness check (see missing_rows)
+        """
+        self._open()
+        return np.array(self._pixels[row])
+
+    def put(self, row, mtime_ns, array):
+        self._open()
+        self._pixels[row] = array
+        # The mtime is written last, it marks the row as valid
+        self._mtimes[row] = mtime_ns
@@ -1,29 +1,527 @@
-from torch.utils.data import Dataset
+import torch
+from torch.utils.data import DataLoader, Dataset, IterableDataset, Sampler, Subset, get_worker_info
+import io
+import logging
 import os
+import re
+import random
+import time
+from collections import defaultdict
+import cv2
 from PIL import Image
 
+from deepfake.deepfakeai.utils.cache import TensorCache
+from deepfake.deepfakeai.utils.index import DatasetIndex
+from deepfake.deepfakeai.utils.landmarks import LandmarkStore
+from deepfake.deepfakeai.utils.preprocess import ToUint8Tensor, normalize_batch
+from deepfake.deepfakeai.utils.shards import (
+    iter_shard,
+    list_shards,
+    manifest_shard_members,
+    read_shard_index
+)
+
+logger = logging.getLogger(__name__)
+
+DECODE_BACKENDS = ["pil", "pil-draft", "cv2", "turbojpeg"]
+JPEG_SCALES = (8, 4, 2)
+
+
+def _turbojpeg():
+    """
+    PyTurboJPEG decoder instance, or None when the package / library is missing
+    """
+    try:
+        from turbojpeg import TurboJPEG
+        return TurboJPEG()
+    except (ImportError, RuntimeError, OSError):
+        return None
+
+
+class ImageDecoder:
+    """
+    Decode an image file into an RGB PIL image of at least ``size`` pixels per side.
+
+    For JPEG files the reduced-size backends let the decoder produce a 1/2, 1/4
+    or 1/8 scale image directly instead of decoding at full resolution:
+
+    - "pil":       full decode (reference)
+    - "pil-draft": PIL draft mode
+    - "cv2":       OpenCV IMREAD_REDUCED_COLOR_*
+    - "turbojpeg": libjpeg-turbo scaled decode (optional PyTurboJPEG package)
+    - "auto":      turbojpeg when installed, else pil-draft
+
+    Other formats are always fully decoded with PIL.
+    """
+    def __init__(self, backend="pil", size=224):
+        self.size = size
+        self._jpeg = None
+        if backend == "auto":
+            backend = "turbojpeg" if _turbojpeg() is not None else "pil-draft"
+        if backend == "turbojpeg":
+            self._jpeg = _turbojpeg()
+            if self._jpeg is None:
+                logger.warning("PyTurboJPEG is not available, falling back to pil-draft decoding")
+                backend = "pil-draft"
+        if backend not in DECODE_BACKENDS:
+            raise ValueError(f"Unknown decode backend: {backend}")
+        self.backend = backend
+
+    def __getstate__(self):
+        # The TurboJPEG handle wraps a C library, re-create it in each worker
+        state = self.__dict__.copy()
+        state["_jpeg"] = None
+        return state
+
+    def _scale(self, width, height):
+        for scale in JPEG_SCALES:
+            if min(width, height) // scale >= self.size:
+                return scale
+        return 1
+
+    def __call__(self, path):
+        image = Image.open(path)
+        if self.backend == "pil" or image.format != "JPEG":
+            return image.convert("RGB")
+
+        scale = self._scale(*image.size)
+        if self.backend == "pil-draft":
+            image.draft("RGB", (image.size[0] // scale, image.size[1] // scale))
+            return image.convert("RGB")
+
+        image.close()
+        if self.backend == "cv2":
+            flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                     4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+            bgr = cv2.imread(path, flags[scale])
+            return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+
+        if self._jpeg is None:
+            self._jpeg = _turbojpeg()
+        with open(path, "rb") as f:
+            data = f.read()
+        from turbojpeg import TJPF_RGB
+        rgb = self._jpeg.decode(data, pixel_format=TJPF_RGB, scaling_factor=(1, scale))
+        return Image.fromarray(rgb)
+
+
+def benchmark_decoders(root_dir, size=224, samples=200, backends=None):
+    """
+    Time every decode backend on the same random sample of images of a split
+    and log the mean decode time in ms per image. Returns {backend: ms}.
+    """
+    index = DatasetIndex(root_dir)
+    picks = random.Random(0).sample(range(len(index)), min(samples, len(index)))
+    paths = [index[i][0] for i in picks]
+    results = {}
+    for backend in backends or DECODE_BACKENDS:
+        decoder = ImageDecoder(backend, size)
+        if decoder.backend != backend:
+            continue
+        start = time.perf_counter()
+        for path in paths:
+            decoder(path)
+        results[backend] = (time.perf_counter() - start) * 1000 / max(len(paths), 1)
+        logger.info(f"Decode backend {backend}: {results[backend]:.2f} ms/image over {len(paths)} images")
+    return results
+
+
+def sample_frame_batches(root_dir, samples=256, batch_size=16, size=224, seed=0):
+    """
+    Normalized float [N, C, H, W] batches of a fixed random sample of frames of
+    a split (e.g. calibration data for static quantization). Every image is
+    resized as it is loaded, so only ``size`` px frames are held.
+    """
+    index = DatasetIndex(root_dir)
+    picks = random.Random(seed).sample(range(len(index)), min(samples, len(index)))
+    to_tensor = ToUint8Tensor(size)
+    frames = [to_tensor(Image.open(index[i][0]).convert("RGB")) for i in picks]
+    return [
+        normalize_batch(torch.stack(frames[start:start + batch_size]))
+        for start in range(0, len(frames), batch_size)
+    ]
+
+
 class DeepfakeDataset(Dataset):
     """
     Custom Dataset Provider
+
+    With ``cache_dir`` set, images are resized to ``image_size`` once and kept in
+    a memory-mapped TensorCache; samples are then returned as uint8 CHW tensors
+    and ``transform`` is not applied (use preprocess.BatchCollate on the batch).
+    ``decode_backend`` selects the ImageDecoder.
     """
     def __init__(
         self, 
         root_dir, 
-        transform=None
+        transform=None,
+        cache_dir=None,
+        image_size=224,
+        decode_backend="pil"
     ):
-        self.samples = []
+        # Memory-mapped (path, label) index, rescanned only when real/ or fake/ change
+        self.samples = DatasetIndex(root_dir)
+        self.root_dir = root_dir
         self.transform = transform
-        for label, folder in enumerate(["real", "fake"]):
-            folder_path = os.path.join(root_dir, folder)
-            for file in os.listdir(folder_path):
-                self.samples.append((os.path.join(folder_path, file), label))
+        self.image_size = image_size
+        self.decoder = ImageDecoder(decode_backend, image_size)
+        self._landmarks = None
+
+        self.cache = None
+        if cache_dir is not None:
+            cache_name = f"{os.path.basename(os.path.normpath(root_dir))}-{image_size}"
+            self.cache = TensorCache(
+                cache_dir, cache_name, [p for p, _ in self.samples], (3, image_size, image_size)
+            )
 
     def __len__(self):
         return len(self.samples)
 
+    def _load_cached(self, idx, img_path):
+        mtime_ns = os.stat(img_path).st_mtime_ns
+        array = self.cache.get(idx, mtime_ns)
+        if array is None:
+            image = self.decoder(img_path)
+            array = ToUint8Tensor(self.image_size)(image).numpy()
+            self.cache.put(idx, mtime_ns, array)
+        return torch.from_numpy(array)
+
     def __getitem__(self, idx):
         img_path, label = self.samples[idx]
-        image = Image.open(img_path).convert("RGB")
+        if self.cache is not None:
+            return self._load_cached(idx, img_path), label
+        image = self.decoder(img_path)
+        if self.transform:
+            image = self.transform(image)
+        return image, label
+
+    def __getstate__(self):
+        # Never pickle an open memmap into DataLoader workers
+        state = self.__dict__.copy()
+        state["_landmarks"] = None
+        return state
+
+    def get_landmark(self, idx):
+        """
+        Landmarks of sample ``idx`` from the memory-mapped landmark store
+        (opened lazily, so every DataLoader worker maps it on its own)
+        """
+        if self._landmarks is None:
+            self._landmarks = LandmarkStore(self.root_dir)
+        img_path, _ = self.samples[idx]
+        key = os.path.relpath(img_path, os.path.dirname(os.path.normpath(self.root_dir)))
+        return self._landmarks[key]
+
+
+class ShardedDeepfakeDataset(IterableDataset):
+    """
+    Dataset Provider for frames packed into tar shards by the extractor.
+
+    Every DataLoader worker reads its own subset of shards sequentially.
+    Shuffling is done at shard level (shard order changes every epoch) plus a
+    bounded in-memory shuffle buffer, so no random access is needed.
+    Call ``set_epoch`` before each epoch to get a new shard order; its
+    ``skip_batches`` drops the first batches of a resumed epoch before decoding.
+
+    Shards are append-only: members the extraction manifest no longer lists
+    (older extractions of re-processed videos, dropped videos) are skipped.
+    """
+    def __init__(
+        self,
+        root_dir,
+        transform=None,
+        shuffle=True,
+        buffer_size=1000,
+        seed=0
+    ):
+        self.root_dir = root_dir
+        self.shards = list_shards(root_dir)
+        if not self.shards:
+            raise FileNotFoundError(f"No shards found in {root_dir}, run extract with output_format 'shards'")
+        self.transform = transform
+        self.shuffle = shuffle
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.epoch = 0
+        self.skip_batches = 0
+        self.batch_size = 1
+        self._length = None
+        # None without a manifest: every member is served
+        self.members = manifest_shard_members(root_dir)
+
+    def set_epoch(self, epoch, skip_batches=0, batch_size=1):
+        self.epoch = epoch
+        self.skip_batches = skip_batches
+        self.batch_size = batch_size
+
+    def _skip_samples(self, worker):
+        # DataLoader takes batches from the workers in turn
+        if worker is None:
+            return self.skip_batches * self.batch_size
+        batches = max(0, (self.skip_batches - worker.id + worker.num_workers - 1) // worker.num_workers)
+        return batches * self.batch_size
+
+    def _is_listed(self, shard, name):
+        if self.members is None:
+            return True
+        members, unplaced = self.members
+        return name in members.get(os.path.basename(shard), ()) or name in unplaced
+
+    def __len__(self):
+        if self._length is None and self.members is not None:
+            members, unplaced = self.members
+            names = {os.path.basename(shard) for shard in self.shards}
+            self._length = sum(len(m) for shard, m in members.items() if shard in names) + len(unplaced)
+        if self._length is None:
+            index = read_shard_index(self.root_dir)
+            self._length = sum(
+                index[os.path.basename(shard)] if os.path.basename(shard) in index
+                else sum(1 for _ in iter_shard(shard))
+                for shard in self.shards
+            )
+        return self._length
+
+    def _decode(self, name, data):
+        label = 0 if name.startswith("real/") else 1
+        image = Image.open(io.BytesIO(data)).convert("RGB")
         if self.transform:
             image = self.transform(image)
         return image, label
+
+    def __iter__(self):
+        shards = list(self.shards)
+        worker = get_worker_info()
+        worker_id = worker.id if worker else 0
+
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(shards)
+        if worker is not None:
+            shards = shards[worker.id::worker.num_workers]
+
+        rng = random.Random((self.seed + self.epoch) * 1000 + worker_id)
+        skip = self._skip_samples(worker)
+        for name, data in self._iter_members(shards, rng):
+            if skip:
+                # Finished before an interruption: same order, not decoded
+                skip -= 1
+                continue
+            yield self._decode(name, data)
+
+    def _iter_members(self, shards, rng):
+        buffer = []
+        for shard in shards:
+            for name, data in iter_shard(shard):
+                if not self._is_listed(shard, name):
+                    continue
+                if not self.shuffle:
+                    yield name, data
+                    continue
+                buffer.append((name, data))
+                if len(buffer) >= self.buffer_size:
+                    idx = rng.randrange(len(buffer))
+                    buffer[idx], buffer[-1] = buffer[-1], buffer[idx]
+                    yield buffer.pop()
+
+        rng.shuffle(buffer)
+        yield from buffer
+
+
+class ResumableRandomSampler(Sampler):
+    """
+    Random permutation of a map-style dataset, drawn from ``seed`` and the
+    epoch, so a resumed epoch can start part-way through by index
+    (``set_epoch(epoch, start)``) without loading the finished samples
+    """
+    def __init__(self, data_source, seed=0):
+        self.num_samples = len(data_source)
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.start = start
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed * 100003 + self.epoch)
+        yield from torch.randperm(self.num_samples, generator=generator)[self.start:].tolist()
+
+    def __len__(self):
+        return max(self.num_samples - self.start, 0)
+
+
+FRAME_NAME_RE = re.compile(r"^(?P<video>.+)_frame_(?P<frame>\d+)\.\w+$")
+
+
+class VideoSequenceDataset(Dataset):
+    """
+    Groups the frames of a frame-level DeepfakeDataset by source video
+    (``videoName_frame_N.<ext>`` naming) into ordered windows of ``seq_len`` frames.
+
+    Videos shorter than ``seq_len`` give one shorter window, padded by
+    preprocess.SequenceCollate. Items are (uint8 [S, C, H, W] tensor, label),
+    so the frame dataset must return uint8 tensors (ToUint8Tensor or cache);
+    over a features.FeatureDataset items are float [S, D] feature sequences.
+    """
+    def __init__(
+        self,
+        frame_dataset,
+        seq_len=10,
+        stride=None
+    ):
+        self.frame_dataset = frame_dataset
+        self.seq_len = seq_len
+        stride = stride or seq_len
+
+        videos = defaultdict(list)
+        for idx, (img_path, label) in enumerate(frame_dataset.samples):
+            match = FRAME_NAME_RE.match(os.path.basename(img_path))
+            if match is None:
+                continue
+            video_key = (os.path.dirname(img_path), match.group("video"))
+            videos[video_key].append((int(match.group("frame")), idx, label))
+
+        self.windows = []
+        for frames in videos.values():
+            frames.sort()
+            idxs = [idx for _, idx, _ in frames]
+            label = frames[0][2]
+            for start in range(0, max(len(idxs) - seq_len, 0) + 1, stride):
+                self.windows.append((idxs[start:start + seq_len], label))
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __getitem__(self, idx):
+        frame_idxs, label = self.windows[idx]
+        frames = torch.stack([self.frame_dataset[i][0] for i in frame_idxs])
+        return frames, label
+
+
+def build_dataset(root_dir, transform=None, data_format="files", shuffle=False, cache_dir=None,
+                  seq_len=1, seq_stride=None, decode_backend="pil", image_size=224):
+    """
+    Create the dataset for one split directory in the configured format
+    ("files": one image per frame, "shards": packed tar shards).
+    ``cache_dir`` enables the uint8 tensor cache of the "files" format,
+    ``seq_len`` > 1 groups frames into per-video sequences and ``decode_backend``
+    selects the ImageDecoder. ``image_size`` must match ``transform``.
+    """
+    if data_format == "shards":
+        if seq_len > 1:
+            raise ValueError("Sequence training is not supported with the 'shards' dataset format")
+        return ShardedDeepfakeDataset(root_dir=root_dir, transform=transform, shuffle=shuffle)
+    if data_format == "files":
+        dataset = DeepfakeDataset(
+            root_dir=root_dir, transform=transform, cache_dir=cache_dir, decode_backend=decode_backend,
+            image_size=image_size
+        )
+        if seq_len > 1:
+            return VideoSequenceDataset(dataset, seq_len=seq_len, stride=seq_stride)
+        return dataset
+    raise ValueError(f"Unknown dataset format: {data_format}")
+
+
+def dataset_cache_dir(config):
+    """
+    Tensor cache directory if dataloader.cache is enabled, else None
+    """
+    dataloader_config = config.get("dataloader", {})
+    if not dataloader_config.get("cache", False):
+        return None
+    return dataloader_config.get("cache_dir") or str(config["imgdir"] / "cache")
+
+
+def _probe_candidates(max_workers):
+    workers = [0] + [w for w in (1, 2, 4, 8, 16, 32) if w <= max_workers]
+    if max_workers not in workers:
+        workers.append(max_workers)
+    return [(w, p) for w in workers for p in ((None,) if w == 0 else (2, 4))]
+
+
+def probe_loader_throughput(dataset, collate_fn, batch_size, probe_batches=20, max_workers=None):
+    """
+    Time a few batches for every (num_workers, prefetch_factor) candidate and
+    return the fastest one as DataLoader kwargs.
+
+    Each candidate reads a different random subset (map-style datasets) so
+    warm page / tensor caches favour later candidates as little as possible.
+    The first batch of every run is not timed (worker start-up).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    rng = random.Random(0)
+    best, best_rate = None, -1.0
+    for num_workers, prefetch_factor in _probe_candidates(max_workers):
+        probe_dataset = dataset
+        if not isinstance(dataset, IterableDataset):
+            count = min(len(dataset), batch_size * (probe_batches + 1))
+            probe_dataset = Subset(dataset, rng.sample(range(len(dataset)), count))
+
+        kwargs = {"num_workers": num_workers}
+        if prefetch_factor is not None:
+            kwargs["prefetch_factor"] = prefetch_factor
+        loader = DataLoader(probe_dataset, batch_size=batch_size, collate_fn=collate_fn, **kwargs)
+
+        samples, start = 0, None
+        for i, batch in enumerate(loader):
+            if i == 0:
+                start = time.perf_counter()
+                continue
+            samples += len(batch[1])
+            if i >= probe_batches:
+                break
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        rate = samples / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"Loader probe: workers={num_workers}, prefetch={prefetch_factor}: {rate:.1f} samples/sec"
+        )
+        if rate > best_rate:
+            best, best_rate = kwargs, rate
+
+    logger.info(f"Selected loader settings {best} ({best_rate:.1f} samples/sec)")
+    return best
+
+
+def create_data_loader(dataset, config, collate_fn=None, shuffle=False, sampler=None):
+    """
+    Build the DataLoader from the ``dataloader`` config section:
+    batch_size, num_workers (int or "auto"), prefetch_factor,
+    persistent_workers (not for datasets reshuffled with ``set_epoch``)
+    and pin_memory (defaults to CUDA availability).
+    With num_workers "auto" a short throughput probe over the dataset picks
+    num_workers and prefetch_factor. A ``sampler`` replaces ``shuffle``.
+    """
+    dataloader_config = config.get("dataloader", {})
+    batch_size = dataloader_config.get("batch_size", 16)
+    num_workers = dataloader_config.get("num_workers", 2)
+
+    if num_workers == "auto":
+        kwargs = probe_loader_throughput(
+            dataset, collate_fn, batch_size,
+            probe_batches=dataloader_config.get("probe_batches", 20)
+        )
+    else:
+        kwargs = {"num_workers": num_workers}
+        if num_workers > 0 and dataloader_config.get("prefetch_factor"):
+            kwargs["prefetch_factor"] = dataloader_config["prefetch_factor"]
+
+    if kwargs["num_workers"] > 0:
+        persistent_workers = dataloader_config.get("persistent_workers", False)
+        if persistent_workers and isinstance(dataset, IterableDataset) and hasattr(dataset, "set_epoch"):
+            # Persistent workers keep their first-epoch copy of the dataset, so
+            # set_epoch would never reach them and every epoch repeats one order
+            logger.warning("persistent_workers disabled: the shard order must change every epoch")
+            persistent_workers = False
+        kwargs["persistent_workers"] = persistent_workers
+
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        # Shards shuffle themselves
+        shuffle=shuffle and sampler is None and not isinstance(dataset, IterableDataset),
+        sampler=sampler,
+        pin_memory=dataloader_config.get("pin_memory", torch.cuda.is_available()),
+        collate_fn=collate_fn,
+        **kwargs
+    )
@@ -0,0 +1,121 @@
+import contextlib
+import copy
+import logging
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Subset
+from tqdm import tqdm
+
+from deepfake.deepfakeai.utils.cache import TensorCache
+from deepfake.deepfakeai.utils.dataloader import (
+    DeepfakeDataset,
+    VideoSequenceDataset,
+    create_data_loader
+)
+from deepfake.deepfakeai.utils.preprocess import BatchCollate
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureDataset(Dataset):
+    """
+    Frame-level dataset serving cached backbone features (float32 [cnn + vit])
+    instead of images.
+
+    Exposes the ``samples`` index of the wrapped DeepfakeDataset, so
+    VideoSequenceDataset can group its rows into per-video feature sequences.
+    """
+    def __init__(self, frame_dataset, cache):
+        self.samples = frame_dataset.samples
+        self.cache = cache
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        _, label = self.samples[idx]
+        return torch.from_numpy(self.cache.row(idx)), label
+
+
+class FeatureCollate:
+    """
+    DataLoader collate_fn for feature samples, the counterpart of
+    preprocess.BatchCollate / SequenceCollate.
+
+    Returns (features [B, Seq, D], labels, lengths); single frames become
+    sequences of length 1 (lengths None), sequences are right-padded.
+    """
+    def __call__(self, batch):
+        labels = torch.as_tensor([label for _, label in batch])
+        if batch[0][0].dim() == 1:
+            return torch.stack([feat for feat, _ in batch]).unsqueeze(1), labels, None
+
+        lengths = torch.as_tensor([seq.shape[0] for seq, _ in batch])
+        feats = torch.zeros((len(batch), int(lengths.max()), batch[0][0].shape[1]))
+        for i, (seq, _) in enumerate(batch):
+            feats[i, :seq.shape[0]] = seq
+        return feats, labels, lengths
+
+
+def feature_cache_dir(config):
+    """
+    Directory of the feature caches: dataloader.cache_dir, else imgdir/cache
+    """
+    return config.get("dataloader", {}).get("cache_dir") or str(config["imgdir"] / "cache")
+
+
+def build_feature_dataset(model, dataset, config, device, policy=None):
+    """
+    Run the CNN + ViT backbones of ``model`` once over the frames of ``dataset``
+    and return an equivalent dataset serving the cached features.
+
+    Features are stored in a memory-mapped TensorCache keyed by frame (named
+    after split, backbones, image size, precision and token budget); only frames that are new or changed
+    since the last run go through the backbones. ``dataset`` is a DeepfakeDataset
+    returning uint8 tensors, or a VideoSequenceDataset over one. Random flips are
+    not applied: every frame has exactly one cached feature vector. The backbones
+    run under the autocast of ``policy`` (models.precision.PrecisionPolicy), features
+    are stored as float32.
+    """
+    frame_dataset = dataset.frame_dataset if isinstance(dataset, VideoSequenceDataset) else dataset
+    if not isinstance(frame_dataset, DeepfakeDataset):
+        raise ValueError("The feature cache needs the 'files' dataset format")
+
+    paths = [p for p, _ in frame_dataset.samples]
+    split = os.path.basename(os.path.normpath(frame_dataset.root_dir))
+    precision = policy.precision if policy is not None else "fp32"
+    name = f"features-{split}-{model.cnn_backbone}-{model.vit_backbone}-{frame_dataset.image_size}-{precision}"
+    if model.vit_token_budget:
+        # Token merging changes the ViT features
+        name += f"-tome{model.vit_token_budget}"
+    cache = TensorCache(
+        feature_cache_dir(config), name, paths, (model.temporal.lstm.input_size,), dtype=np.float32
+    )
+
+    missing = cache.missing_rows(paths)
+    if missing:
+        logger.info(f"Computing backbone features for {len(missing)} of {len(paths)} frames")
+        loader = create_data_loader(
+            Subset(frame_dataset, missing), config, collate_fn=BatchCollate(train=False), shuffle=False
+        )
+        was_training = model.training
+        model.eval()
+        rows = iter(missing)
+        autocast = policy.autocast() if policy is not None else contextlib.nullcontext()
+        with torch.no_grad(), autocast:
+            for imgs, _ in tqdm(loader):
+                feats = model.frame_features(imgs.to(device, non_blocking=True)).float().cpu().numpy()
+                for feat in feats:
+                    row = next(rows)
+                    cache.put(row, os.stat(paths[row]).st_mtime_ns, feat)
+        model.train(was_training)
+
+    features = FeatureDataset(frame_dataset, cache)
+    if isinstance(dataset, VideoSequenceDataset):
+        # Same windows, frames now resolve to feature rows
+        dataset = copy.copy(dataset)
+        dataset.frame_dataset = features
+        return dataset
+    return features
@@ -0,0 +1,12 @@
+import os
+
+import torch
+
+
+def atomic_save(obj, path):
+    """
+    torch.save to a temporary file, then rename, so an interrupted write never
+    leaves a truncated file at ``path``
+    """
+    torch.save(obj, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
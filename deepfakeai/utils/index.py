@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATHS_NAME = "index_paths.npy"
+INDEX_LABELS_NAME = "index_labels.npy"
+INDEX_META_NAME = "index.json"
+CLASS_FOLDERS = ["real", "fake"]
+
+
+class DatasetIndex:
+    """
+    Persisted sample index of one split directory.
+
+    File names (relative to ``root_dir``, utf-8 bytes) and int8 labels are kept
+    in two .npy arrays next to the images and memory-mapped, so DataLoader
+    workers share the pages instead of receiving a pickled list. The index is
+    rebuilt only when the mtime of a class folder changes.
+
+    Behaves like a read-only list of (absolute path, label) tuples.
+    """
+    def __init__(self, root_dir):
+        self.root_dir = str(root_dir)
+        self._paths = None
+        self._labels = None
+
+        if not self._is_current():
+            self._build()
+        self._open()
+
+    def _folder_mtimes(self):
+        return {
+            folder: os.stat(os.path.join(self.root_dir, folder)).st_mtime_ns
+            for folder in CLASS_FOLDERS
+        }
+
+    def _is_current(self):
+        meta_path = os.path.join(self.root_dir, INDEX_META_NAME)
+        if not os.path.isfile(meta_path):
+            return False
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        return meta.get("mtimes") == self._folder_mtimes()
+
+    def _build(self):
+        mtimes = self._folder_mtimes()
+        names, labels = [], []
+        for label, folder in enumerate(CLASS_FOLDERS):
+            with os.scandir(os.path.join(self.root_dir, folder)) as entries:
+                files = sorted(entry.name for entry in entries if entry.is_file())
+            names.extend(f"{folder}/{name}".encode() for name in files)
+            labels.extend([label] * len(files))
+
+        paths = np.asarray(names, dtype=bytes) if names else np.zeros(0, dtype="S1")
+        self._save(INDEX_PATHS_NAME, paths)
+        self._save(INDEX_LABELS_NAME, np.asarray(labels, dtype=np.int8))
+        meta_path = os.path.join(self.root_dir, INDEX_META_NAME)
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"mtimes": mtimes, "count": len(names)}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        logger.info(f"Built dataset index for {self.root_dir}: {len(names)} images")
+
+    def _save(self, name, array):
+        # Write to a temporary file first so readers never see a partial index
+        path = os.path.join(self.root_dir, name)
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(f"{path}.tmp", path)
+
+    def _load(self, name):
+        path = os.path.join(self.root_dir, name)
+        try:
+            return np.load(path, mmap_mode="r")
+        except ValueError:
+            # Empty arrays cannot be memory-mapped
+            return np.load(path)
+
+    def _open(self):
+        self._paths = self._load(INDEX_PATHS_NAME)
+        self._labels = self._load(INDEX_LABELS_NAME)
+
+    def __getstate__(self):
+        # Workers re-map the arrays instead of receiving copies
+        return {"root_dir": self.root_dir}
+
+    def __setstate__(self, state):
+        self.root_dir = state["root_dir"]
+        self._open()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __getitem__(self, idx):
+        path = os.path.join(self.root_dir, self._paths[idx].decode())
+        return path, int(self._labels[idx])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
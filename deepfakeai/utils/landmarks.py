@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LANDMARK_ARRAY_NAME = "ldm.npy"
+LANDMARK_KEYS_NAME = "ldm_keys.npy"
+LANDMARK_LABELS_NAME = "ldm_labels.npy"
+
+
+def build_landmark_store(split_dir, shard_name, valid_keys=None):
+    """
+    Compile the JSON lines landmark shard of one split into the binary store:
+
+    - ldm.npy:        int16 [N, num_points, 2]
+    - ldm_keys.npy:   image keys (row i belongs to key i)
+    - ldm_labels.npy: int8 labels
+
+    Records are de-duplicated (last record per key wins) and, if ``valid_keys``
+    is given, restricted to those keys. Returns the number of stored frames.
+    """
+    records = {}
+    shard_path = os.path.join(str(split_dir), shard_name)
+    if os.path.isfile(shard_path):
+        with open(shard_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt landmark line in {shard_path}")
+                    continue
+                if valid_keys is None or record["key"] in valid_keys:
+                    records[record["key"]] = record
+
+    keys = sorted(records)
+    num_points = len(records[keys[0]]["landmark"]) if keys else 0
+    landmarks = np.empty((len(keys), num_points, 2), dtype=np.int16)
+    for row, key in enumerate(keys):
+        landmarks[row] = records[key]["landmark"]
+    labels = np.asarray([records[k]["label"] for k in keys], dtype=np.int8)
+
+    np.save(os.path.join(str(split_dir), LANDMARK_ARRAY_NAME), landmarks)
+    np.save(os.path.join(str(split_dir), LANDMARK_KEYS_NAME), np.asarray(keys, dtype=str))
+    np.save(os.path.join(str(split_dir), LANDMARK_LABELS_NAME), labels)
+    return len(keys)
+
+
+class LandmarkStore:
+    """
+    Read-only, memory-mapped access to the binary landmark store of one split.
+
+    Landmarks are looked up by image key (e.g. ``train/real/<video>_frame_0.png``)
+    through a key -> row dict; only the requested row is paged in.
+    """
+    def __init__(self, split_dir):
+        self.split_dir = str(split_dir)
+        self.landmarks = np.load(os.path.join(self.split_dir, LANDMARK_ARRAY_NAME), mmap_mode="r")
+        self.labels = np.load(os.path.join(self.split_dir, LANDMARK_LABELS_NAME), mmap_mode="r")
+        keys = np.load(os.path.join(self.split_dir, LANDMARK_KEYS_NAME))
+        self._rows = {key: row for row, key in enumerate(keys.tolist())}
+
+    @classmethod
+    def exists(cls, split_dir):
+        return os.path.isfile(os.path.join(str(split_dir), LANDMARK_ARRAY_NAME))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __getitem__(self, key):
+        """
+        Landmarks of one image as an int16 [num_points, 2] array
+        """
+        return self.landmarks[self._rows[key]]
+
+    def label(self, key):
+        return int(self.labels[self._rows[key]])
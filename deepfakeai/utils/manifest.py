@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+FINGERPRINT_CHUNK = 64 * 1024
+
+
+def fingerprint_file(path, chunk_size=FINGERPRINT_CHUNK):
+    """
+    Cheap content fingerprint: file size plus a SHA-1 over the first and last chunk
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(size - chunk_size, chunk_size))
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+
+class ExtractionManifest:
+    """
+    Append-only record of every processed source video.
+
+    Each line holds the video key (path relative to the data directory), its
+    fingerprint, the split it was assigned to, the frames it produced and the
+    extractor settings used. The last line for a video wins. Videos extracted
+    into tar shards also record the shard holding each frame.
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self.records = {}
+        self._file = None
+
+        if os.path.isfile(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from an interrupted run
+                        logger.warning(f"Skipping corrupt manifest line in {self.path}")
+                        continue
+                    self.records[record["video"]] = record
+            logger.info(f"Loaded manifest with {len(self.records)} processed videos")
+
+    def __contains__(self, video_key):
+        return video_key in self.records
+
+    def get(self, video_key):
+        return self.records.get(video_key)
+
+    def fingerprint(self, video_key, video_path):
+        """
+        Return the fingerprint of a video, reusing the recorded one when size and
+        mtime are unchanged so unchanged videos only cost a stat() call.
+        """
+        stat = os.stat(video_path)
+        record = self.records.get(video_key)
+        if record and record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+            return record["fingerprint"], stat
+        return fingerprint_file(video_path), stat
+
+    def is_current(self, video_key, fingerprint, settings):
+        """
+        True if the video was already processed with the same content and settings
+        """
+        record = self.records.get(video_key)
+        return (
+            record is not None
+            and record["fingerprint"] == fingerprint
+            and record["settings"] == settings
+        )
+
+    def add(self, video_key, fingerprint, stat, split, frames, settings, shards=None):
+        record = {
+            "video": video_key,
+            "fingerprint": fingerprint,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "split": split,
+            "frames": frames,
+            "settings": settings,
+        }
+        if shards is not None:
+            # {frame key: shard file name}
+            record["shards"] = shards
+        self.records[video_key] = record
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def compact(self):
+        """
+        Rewrite the manifest with one line per video (atomic replace)
+        """
+        self.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for record in self.records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.path)
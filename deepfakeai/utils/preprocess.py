@@ -1,5 +1,12 @@
 import cv2
 import os
+import numpy as np
+import torch
+from PIL import Image
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+IMAGE_SIZE = 224
 
 def extract_frames(video_path, save_dir, frame_rate=10):
     cap = cv2.VideoCapture(video_path)
@@ -14,3 +21,96 @@ def extract_frames(video_path, save_dir, frame_rate=10):
             frame_id += 1
         count += 1
     cap.release()
+
+
+def normalize_batch(imgs):
+    """
+    uint8 [..., C, H, W] batch -> float batch normalized with the ImageNet statistics
+    """
+    mean = torch.tensor(IMAGENET_MEAN, device=imgs.device).view(1, -1, 1, 1)
+    std = torch.tensor(IMAGENET_STD, device=imgs.device).view(1, -1, 1, 1)
+    return (imgs.float() / 255.0 - mean) / std
+
+
+def random_flip_batch(imgs, p=0.5):
+    """
+    Horizontally flip each item of a [B, C, H, W] (or [B, Seq, C, H, W]) batch
+    with probability p; all frames of a sequence are flipped together
+    """
+    flip = torch.rand(imgs.shape[0], device=imgs.device) < p
+    return torch.where(flip.view(-1, *([1] * (imgs.dim() - 1))), imgs.flip(-1), imgs)
+
+
+class ToUint8Tensor:
+    """
+    Per-sample transform: PIL image -> resized uint8 [C, H, W] tensor.
+    Everything else (flip, float conversion, normalization) runs on the batch.
+    """
+    def __init__(self, size=IMAGE_SIZE):
+        self.size = size
+
+    def __call__(self, image):
+        if image.size != (self.size, self.size):
+            image = image.resize((self.size, self.size), Image.BILINEAR)
+        return torch.from_numpy(np.asarray(image, dtype=np.uint8).transpose(2, 0, 1).copy())
+
+
+class BatchCollate:
+    """
+    DataLoader collate_fn for (uint8 image, label) samples.
+
+    Stacks the batch, flips it at random for training and normalizes it,
+    all as vectorized tensor operations on the whole batch.
+    """
+    def __init__(self, train=False, flip_p=0.5):
+        self.train = train
+        self.flip_p = flip_p
+
+    def __call__(self, batch):
+        imgs = torch.stack([img for img, _ in batch])
+        labels = torch.as_tensor([label for _, label in batch])
+        if self.train:
+            imgs = random_flip_batch(imgs, self.flip_p)
+        return normalize_batch(imgs), labels
+
+
+class SequenceCollate:
+    """
+    DataLoader collate_fn for (uint8 [S, C, H, W] sequence, label) samples.
+
+    Right-pads every sequence to the longest one in the batch and returns
+    (imgs [B, Seq, C, H, W], labels, lengths); padded steps are ignored by the model.
+    """
+    def __init__(self, train=False, flip_p=0.5):
+        self.train = train
+        self.flip_p = flip_p
+
+    def __call__(self, batch):
+        lengths = torch.as_tensor([seq.shape[0] for seq, _ in batch])
+        max_len = int(lengths.max())
+        imgs = torch.zeros((len(batch), max_len, *batch[0][0].shape[1:]), dtype=torch.uint8)
+        for i, (seq, _) in enumerate(batch):
+            imgs[i, :seq.shape[0]] = seq
+        labels = torch.as_tensor([label for _, label in batch])
+        if self.train:
+            imgs = random_flip_batch(imgs, self.flip_p)
+        return normalize_batch(imgs), labels, lengths
+
+
+def split_batch(batch):
+    """
+    Unpack a batch from BatchCollate or SequenceCollate into
+    (imgs [B, Seq, C, H, W], labels, lengths or None)
+    """
+    if len(batch) == 3:
+        return batch
+    imgs, labels = batch
+    return imgs.unsqueeze(1), labels, None
+
+
+def images_to_batch(images, size=IMAGE_SIZE):
+    """
+    Inference variant: list of PIL images -> normalized float [N, C, H, W] batch
+    """
+    to_tensor = ToUint8Tensor(size)
+    return normalize_batch(torch.stack([to_tensor(image) for image in images]))
@@ -0,0 +1,149 @@
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from collections import defaultdict
+from glob import glob
+
+from deepfake.deepfakeai.utils.manifest import ExtractionManifest, MANIFEST_NAME
+
+logger = logging.getLogger(__name__)
+
+SHARD_DIR = "shards"
+SHARD_INDEX_NAME = "index.jsonl"
+SHARD_SAMPLES = 5000
+
+
+def list_shards(root_dir):
+    """
+    Sorted shard files of one split directory (e.g. imgdir/train)
+    """
+    return sorted(glob(os.path.join(str(root_dir), SHARD_DIR, "shard-*.tar")))
+
+
+def read_shard_index(root_dir):
+    """
+    Return {shard file name: sample count} for every shard closed cleanly
+    """
+    index = {}
+    index_path = os.path.join(str(root_dir), SHARD_DIR, SHARD_INDEX_NAME)
+    if os.path.isfile(index_path):
+        with open(index_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    index[record["shard"]] = record["samples"]
+    return index
+
+
+def manifest_shard_members(root_dir):
+    """
+    Shard members of one split directory that the extraction manifest still
+    lists, so members of re-extracted or dropped videos are skipped.
+
+    Returns ({shard file name: {member names}}, {member names}) where the second
+    set holds frames of manifest records without shard membership (written by
+    older runs; accepted from any shard). None if there is no manifest.
+    """
+    root_dir = os.path.normpath(str(root_dir))
+    manifest_path = os.path.join(os.path.dirname(root_dir), MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return None
+
+    split = os.path.basename(root_dir)
+    members, unplaced = defaultdict(set), set()
+    for record in ExtractionManifest(manifest_path).records.values():
+        if record["split"] != split:
+            continue
+        shards = record.get("shards", {})
+        for key in record["frames"]:
+            # Frame key "<split>/{real,fake}/<file>", member name "{real,fake}/<file>"
+            member = key.split(os.sep, 1)[1]
+            if key in shards:
+                members[shards[key]].add(member)
+            else:
+                unplaced.add(member)
+    return dict(members), unplaced
+
+
+def iter_shard(shard_path):
+    """
+    Yield (member name, bytes) sequentially from a tar shard.
+    A shard truncated by an interrupted extraction is read up to the damage.
+    """
+    try:
+        with tarfile.open(shard_path, "r|") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                yield member.name, tar.extractfile(member).read()
+    except (tarfile.ReadError, EOFError) as e:
+        logger.warning(f"Shard {shard_path} is truncated, stopping early: {e}")
+
+
+class ShardWriter:
+    """
+    Write encoded images into large sequential tar shards.
+
+    Members are stored as ``{real,fake}/<file name>`` so the label can be read
+    back from the member name. A new shard is started every ``max_samples``
+    images; existing shards are never modified. Callbacks registered with
+    ``on_close`` run once the shard holding the images written so far is closed.
+    """
+    def __init__(self, root_dir, max_samples=SHARD_SAMPLES):
+        self.shard_dir = os.path.join(str(root_dir), SHARD_DIR)
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.max_samples = max_samples
+        self._next_idx = len(list_shards(root_dir))
+        self._tar = None
+        self._name = None
+        self._samples = 0
+        self._pending = []
+
+    def _open(self):
+        self._name = f"shard-{self._next_idx:05d}.tar"
+        self._next_idx += 1
+        self._samples = 0
+        self._tar = tarfile.open(os.path.join(self.shard_dir, self._name), "w")
+
+    def _close(self):
+        if self._tar is None:
+            return
+        self._tar.close()
+        with open(os.path.join(self.shard_dir, SHARD_INDEX_NAME), "a") as f:
+            f.write(json.dumps({"shard": self._name, "samples": self._samples}) + "\n")
+        self._tar = None
+        pending, self._pending = self._pending, []
+        for callback in pending:
+            callback()
+
+    def write(self, name, data):
+        """
+        Add one image and return the name of the shard file it went into
+        """
+        if self._tar is None:
+            self._open()
+        shard = self._name
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        self._samples += 1
+        if self._samples >= self.max_samples:
+            self._close()
+        return shard
+
+    def on_close(self, callback):
+        """
+        Run ``callback`` once every image written so far is in a closed shard
+        (right away if no shard is open)
+        """
+        if self._tar is None:
+            callback()
+        else:
+            self._pending.append(callback)
+
+    def close(self):
+        self._close()
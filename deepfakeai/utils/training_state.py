@@ -0,0 +1,85 @@
+import glob
+import logging
+import os
+import random
+
+import numpy as np
+import torch
+
+from deepfake.deepfakeai.utils.files import atomic_save
+
+logger = logging.getLogger(__name__)
+
+
+def training_checkpoint_dir(config):
+    """
+    Directory of the resumable training checkpoints of ``model_name``:
+    train.checkpoint_dir, else modelsdir/checkpoints/<model_name>
+    """
+    checkpoint_dir = config.get("train", {}).get("checkpoint_dir")
+    if checkpoint_dir:
+        return os.path.join(str(checkpoint_dir), config["model_name"])
+    return os.path.join(str(config["modelsdir"]), "checkpoints", config["model_name"])
+
+
+def rng_state():
+    """
+    State of the Python, NumPy and torch (CPU and CUDA) random generators
+    """
+    return {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None
+    }
+
+
+def set_rng_state(state):
+    """
+    Restore the generators saved by rng_state
+    """
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    # Both only accept CPU ByteTensors
+    torch.set_rng_state(state["torch"].cpu())
+    if state.get("cuda") is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all([s.cpu() for s in state["cuda"]])
+
+
+def training_state_paths(checkpoint_dir):
+    """
+    Checkpoint files in ``checkpoint_dir``, oldest first
+    """
+    # Zero-padded global step, so name order is step order
+    return sorted(glob.glob(os.path.join(str(checkpoint_dir), "checkpoint-*.pt")))
+
+
+def latest_training_state(checkpoint_dir):
+    """
+    Newest training state in ``checkpoint_dir``, None if there is none.
+    Loaded on the CPU: the RNG states must stay CPU tensors, load_state_dict
+    moves the weights and optimizer state to the model's device.
+    """
+    paths = training_state_paths(checkpoint_dir)
+    if not paths:
+        return None
+    logger.info(f"Resuming training from {paths[-1]}")
+    # Holds RNG states besides tensors, written by save_training_state only
+    return torch.load(paths[-1], map_location="cpu", weights_only=False)
+
+
+def save_training_state(checkpoint_dir, state, keep=3, replace=()):
+    """
+    Atomically write ``state`` as checkpoint-<step>.pt, then delete the
+    ``replace`` paths (checkpoints of a previous run) and all but the ``keep``
+    newest checkpoints
+    """
+    os.makedirs(str(checkpoint_dir), exist_ok=True)
+    path = os.path.join(str(checkpoint_dir), f"checkpoint-{state['step']:09d}.pt")
+    atomic_save(state, path)
+    for old_path in replace:
+        if old_path != path and os.path.isfile(old_path):
+            os.remove(old_path)
+    for old_path in training_state_paths(checkpoint_dir)[:-max(keep, 1)]:
+        os.remove(old_path)
+    return path
@@ -42,7 +42,7 @@ def main() -> None:
             DeepFake().startup()
 
         elif args.get("command") == "train":
-            DeepFake().start_train()
+            DeepFake().start_train(resume=args.get("resume", False))
 
         elif args.get("command") == "test":
             DeepFake().start_test()
@@ -52,6 +52,12 @@ def main() -> None:
         
         elif args.get("command") == "extract":
             DeepFake().start_extract_frames()
+
+        elif args.get("command") == "export":
+            DeepFake().start_export()
+
+        elif args.get("command") == "distill":
+            DeepFake().start_distill()
             
         elif args.get("command") == "create-userdir":
             start_create_userdir()